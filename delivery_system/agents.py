@@ -1,237 +1,349 @@
 # delivery_system/agents.py
 from mesa import Agent
-from datetime import datetime, time, timedelta
-import random
+from .delivery_calendar import EARLY_ARRIVAL_MINUTES, DeliveryCalendar
+from .event_log import format_minutes
+from .pending import PendingStoreIndex
+from .routing import assign_vehicles
 
 
 class WarehouseAgent(Agent):
     def __init__(self, unique_id, model, inventory):
         super().__init__(unique_id, model)
-        self.inventory = inventory.copy()
-        self.active_orders = {}  # {store_name: {product: amount}}
-        self.pending_stores = {}  # {store_name: needed_products}
+        self.rng = model.spawn_rng()
+        # Количества товаров - векторы по каталогу model.catalog
+        self.catalog = model.catalog
+        self.stock = self.catalog.vector(inventory)
+        self.active_orders = {}  # {store_name: вектор количеств}
+        self.pending_stores = {}  # {store_name: вектор недостающих товаров}
+        self.pending_index = PendingStoreIndex(model)  # Очередь pending_stores
+        self.tick_orders = {}  # Заказы текущего шага: {store: вектор}
+
+    @property
+    def inventory(self):
+        """Запасы склада в виде {товар: количество} (для вывода и снимков)"""
+        return self.catalog.named(self.stock)
 
     def update_active_orders(self, store, products, add=True):
-        """Обновление активных заказов"""
+        """Обновление активных заказов (products - вектор количеств)"""
+        self.model.mark_dirty(self)
         if add:
             # Добавляем новый заказ
-            if store.name not in self.active_orders:
-                self.active_orders[store.name] = {}
-            for product, amount in products.items():
-                current = self.active_orders[store.name].get(product, 0)
-                self.active_orders[store.name][product] = current + amount
+            orders = self.active_orders.setdefault(store.name, self.catalog.zeros())
+            for product_id, amount in enumerate(products):
+                orders[product_id] += amount
         else:
             # Удаляем выполненный заказ
             if store.name in self.active_orders:
-                for product in products:
-                    if product in self.active_orders[store.name]:
-                        del self.active_orders[store.name][product]
-                if not self.active_orders[store.name]:
+                orders = self.active_orders[store.name]
+                for product_id, amount in enumerate(products):
+                    if amount:
+                        orders[product_id] = 0
+                if not any(orders):
                     del self.active_orders[store.name]
 
-    def find_best_store_for_delivery(self):
-        """Поиск подходящего магазина для доставки"""
-        available_stores = []
-        current_time = self.model.current_time
+    def set_pending(self, store, needed_products):
+        """Отложенный заказ магазина (обновляет и очередь pending_index)"""
+        self.pending_stores[store.name] = needed_products
+        self.pending_index.update(store, needed_products)
 
-        for store_name, needed_products in self.pending_stores.items():
-            store = next(s for s in self.model.stores if s.name == store_name)
-
-            # Проверяем есть ли уже машина в пути к этому магазину
-            if store.awaiting_vehicle:
-                continue
+    def drop_pending(self, store_name):
+        """Удаление отложенного заказа магазина"""
+        if self.pending_stores.pop(store_name, None) is not None:
+            self.pending_index.discard(store_name)
 
-            # Получаем расстояние до магазина
-            distance = self.model.data["distances"]["склад"][store.name]
+    def find_best_store_for_delivery(self):
+        """Поиск подходящего магазина для доставки
+
+        Магазин с наибольшей потребностью (при равенстве - ближайший),
+        который не ждет машину и будет открыт при прибытии, берется из
+        очереди pending_index за O(log n).
+        """
+        store = self.pending_index.peek()
+        if store is not None and not self.model.quiet:
+            distance = self.model.scheduler.get_distance("склад", store.name)
             arrival_time = self.calculate_arrival_time(store, distance)
-
-            # Проверяем, будет ли магазин доступен при прибытии
-            if self.will_store_be_available(store, arrival_time):
-                total_need = sum(needed_products.values())
-                available_stores.append((store, total_need, distance, arrival_time))
-
-        if available_stores:
-            # Сортируем по приоритету (сначала по количеству needed_products, потом по расстоянию)
-            available_stores.sort(key=lambda x: (-x[1], x[2]))
-            chosen_store = available_stores[0]
-            print(f"\n[Склад] Выбран магазин {chosen_store[0].name}")
-            print(f"-> Расстояние: {chosen_store[2]} км")
-            print(f"-> Время прибытия: {chosen_store[3].strftime('%H:%M')}")
-            return chosen_store[0]
-
-        return None
+            print(f"\n[Склад] Выбран магазин {store.name}")
+            print(f"-> Расстояние: {distance} км")
+            print(f"-> Время прибытия: {format_minutes(arrival_time)}")
+        return store
 
     def calculate_arrival_time(self, store, distance):
-        """Расчет времени прибытия в магазин"""
-        travel_minutes = distance * 3  # 3 минуты на километр
-        arrival_time = self.model.current_time + timedelta(minutes=travel_minutes)
-        return arrival_time
+        """Расчет времени прибытия в магазин (минуты модельного времени)"""
+        return self.model.current_time + distance * self.model.minutes_per_km
 
     def will_store_be_available(self, store, arrival_time):
         """Проверка, будет ли магазин доступен во время прибытия"""
-        arrival_hour = arrival_time.hour
-
-        for start_hour, end_hour in store.delivery_windows:
-            # Если прибываем во время окна доставки
-            if start_hour <= arrival_hour < end_hour:
-                return True
-            # Если прибываем менее чем за 15 минут до открытия окна
-            elif arrival_hour == start_hour - 1 and arrival_time.minute >= 45:
-                return True
-        return False
+        # Календарь прибытия - окна доставки, открытые на 15 минут раньше
+        return store.arrival_calendar.is_open(arrival_time)
 
     def get_remaining_needs(self, store, needed_products):
-        """Получить реальные потребности с учетом активных заказов"""
-        remaining_needs = needed_products.copy()
-        total_ordered = {}
-
-        if store.name in self.active_orders:
-            for product, amount in self.active_orders[store.name].items():
-                total_ordered[product] = total_ordered.get(product, 0) + amount
-
-        for product, needed in needed_products.items():
-            already_ordered = total_ordered.get(product, 0)
-            remaining = max(0, needed - already_ordered)
-            if remaining == 0:
-                del remaining_needs[product]
-            else:
-                remaining_needs[product] = remaining
+        """Получить реальные потребности с учетом активных заказов
 
-        return remaining_needs
+        Возвращает вектор недостающих товаров или None, если все уже в пути.
+        """
+        ordered = self.active_orders.get(store.name)
+        if ordered is None:
+            remaining_needs = list(needed_products)
+        else:
+            remaining_needs = [
+                max(0, needed - already_ordered)
+                for needed, already_ordered in zip(needed_products, ordered)
+            ]
+        return remaining_needs if any(remaining_needs) else None
 
     def process_order(self, store, needed_products):
-        """Обработка заказа от магазина"""
-        print(f"\n[Склад] Заказ от {store.name}: {needed_products}")
+        """Прием заказа от магазина
+
+        Заказы собираются за весь шаг и распределяются по машинам один раз
+        в dispatch_orders. Повторный заказ того же магазина на шаге
+        заменяет предыдущий.
+        """
+        quiet = self.model.quiet
+        if not quiet:
+            print(
+                f"\n[Склад] Заказ от {store.name}: {self.catalog.as_dict(needed_products)}"
+            )
 
         # Проверяем ожидает ли магазин уже машину
         if store.awaiting_vehicle:
-            print(f"-> Магазин {store.name} уже ожидает доставку")
+            if not quiet:
+                print(f"-> Магазин {store.name} уже ожидает доставку")
             # Сохраняем для последующей обработки, если новые товары требуются
-            if store.name not in self.pending_stores:
-                self.pending_stores[store.name] = {}
-            for product, amount in needed_products.items():
-                current = self.pending_stores[store.name].get(product, 0)
-                self.pending_stores[store.name][product] = current + amount
+            pending = self.pending_stores.get(store.name)
+            if pending is None:
+                pending = list(needed_products)
+            else:
+                pending = [a + b for a, b in zip(pending, needed_products)]
+            self.set_pending(store, pending)
             return False
 
         # Считаем, сколько уже едет в этот магазин
-        in_delivery = self.active_orders.get(store.name, {})
-        if in_delivery:
-            print(f"-> Уже в пути: {in_delivery}")
-
-        # Вычисляем, сколько еще нужно довезти
-        remaining_needs = {}
-        for product, needed_total in needed_products.items():
-            already_in_delivery = in_delivery.get(product, 0)
-            max_can_deliver = store.product_requirements[product]
-            still_needed = min(needed_total, max_can_deliver) - already_in_delivery
-
-            if still_needed > 0:
-                remaining_needs[product] = still_needed
-
-        if not remaining_needs:
-            print("-> Нужное количество товаров уже в пути")
-            return None
+        in_delivery = self.active_orders.get(store.name)
+        if in_delivery and not quiet:
+            print(f"-> Уже в пути: {self.catalog.as_dict(in_delivery)}")
 
-        # Получаем расстояние до магазина
-        distance = self.model.data["distances"]["склад"][store.name]
-        arrival_time = self.calculate_arrival_time(store, distance)
+        self.tick_orders[store] = needed_products
+        if not quiet:
+            print("-> Заказ будет распределен по машинам в конце шага")
+        return True
 
-        # Проверяем, будет ли магазин доступен при прибытии
-        if not self.will_store_be_available(store, arrival_time):
-            print(
-                f"-> Магазин будет закрыт при прибытии ({arrival_time.strftime('%H:%M')})"
-            )
-            print(f"-> Заказ будет обработан позже")
-            if store.name not in self.pending_stores:
-                self.pending_stores[store.name] = {}
-            for product, amount in remaining_needs.items():
-                current = self.pending_stores[store.name].get(product, 0)
-                self.pending_stores[store.name][product] = current + amount
-            return False
+    def dispatch_orders(self):
+        """Распределение всех заказов шага одним планом на весь парк
 
-        # Распределяем заказ между свободными машинами
-        deliveries_made = False
-        for vehicle in self.model.vehicles:
-            if vehicle.status == "idle":
-                available_products = {}
-                total_weight = 0
-                current_needs = (
-                    remaining_needs.copy()
-                )  # Копируем оставшиеся потребности
-
-                # Проверяем каждый продукт
-                for product, needed in list(current_needs.items()):
-                    if total_weight >= vehicle.capacity:
-                        break
-
-                    stock_available = self.inventory.get(product, 0)
-                    if stock_available <= 0:
-                        continue
-
-                    # Определяем, сколько можем загрузить
-                    space_left = vehicle.capacity - total_weight
-                    can_take = min(needed, stock_available, space_left)
-
-                    if can_take > 0:
-                        available_products[product] = can_take
-                        total_weight += can_take
-                        self.inventory[product] -= can_take
-
-                        # Обновляем оставшиеся потребности
-                        remaining_needs[product] -= can_take
-                        if remaining_needs[product] <= 0:
-                            del remaining_needs[product]
-
-                # Если есть что везти - отправляем машину
-                if available_products:
-                    if vehicle.load_delivery(available_products, store):
-                        deliveries_made = True
-                        print(
-                            f"-> Машина {vehicle.unique_id} загружена: {available_products}"
-                        )
+        Вызывается моделью один раз за шаг, после того как все магазины
+        сделали заказы. В план входят заказы шага и отложенные заказы
+        магазинов, которые не ждут машину.
+        """
+        orders = {}
+        for store, needed_products in self.tick_orders.items():
+            if store.awaiting_vehicle:
+                continue
+            remaining_needs = self.get_remaining_needs(store, needed_products)
+            if remaining_needs:
+                orders[store] = remaining_needs
+            elif not self.model.quiet:
+                print(f"\n[Склад] {store.name}: нужное количество товаров уже в пути")
+        self.tick_orders = {}
+
+        if self.model.idle_vehicles:
+            orders.update(self.collect_pending_orders(exclude=orders))
+        elif orders and not self.model.quiet:
+            print("\n[Склад] Нет свободных машин")
+        if orders:
+            self.dispatch_routes(orders)
+
+    def collect_pending_orders(self, exclude=()):
+        """Текущие потребности отложенных магазинов, к которым можно выехать
+
+        Магазины извлекаются из pending_index в порядке приоритета; закрытые
+        при прибытии и ожидающие машину магазины не просматриваются.
+        Заказы, которые не удастся развезти, возвращаются в очередь
+        через set_pending в dispatch_routes.
+        """
+        orders = {}
+        while True:
+            store = self.pending_index.pop()
+            if store is None:
+                break
+            if store in exclude:
+                continue
+            needed_products = store.check_inventory_and_make_order()
+            remaining_needs = (
+                self.get_remaining_needs(store, needed_products)
+                if needed_products
+                else None
+            )
+            if remaining_needs:
+                orders[store] = remaining_needs
+            else:
+                # Запасы пополнены или нужное уже в пути - заказ больше не нужен
+                del self.pending_stores[store.name]
+        return orders
+
+    def dispatch_routes(self, orders):
+        """Развоз заказов {магазин: товары} свободными машинами
+
+        Заказы ограничиваются остатками склада (в порядке orders), слишком
+        большие заказы делятся на части по грузоподъемности машины (по весу
+        товаров из каталога), маршруты строит model.route_planner, а машины
+        назначаются маршрутам алгоритмом assign_vehicles. Если груз не
+        помещается в машину, уменьшаются последние остановки маршрута.
+        Недоставленное остается в pending_stores. Возвращает
+        {магазин: вектор отправленных товаров}.
+        """
+        quiet = self.model.quiet
+        catalog = self.catalog
+        idle = self.model.get_idle_vehicles()
+        if not idle:
+            for store, products in orders.items():
+                self.set_pending(store, list(products))
+            return {}
+        max_capacity = max(vehicle.capacity for vehicle in idle)
+
+        # Остатки склада распределяются по заказам, затем заказы делятся на
+        # части, каждая из которых помещается в одну машину
+        stock = list(self.stock)
+        parts = []
+        for store, products in orders.items():
+            part = catalog.zeros()
+            part_weight = 0
+            for product_id, amount in enumerate(products):
+                if not amount or catalog.weights[product_id] > max_capacity:
+                    # Единица товара тяжелее любой свободной машины
+                    continue
+                amount = min(amount, stock[product_id])
+                stock[product_id] -= amount
+                while amount > 0:
+                    take = min(
+                        amount,
+                        catalog.units_within(product_id, max_capacity - part_weight),
+                    )
+                    part[product_id] += take
+                    part_weight += take * catalog.weights[product_id]
+                    amount -= take
+                    if not take or part_weight >= max_capacity:
+                        parts.append((store, part))
+                        part = catalog.zeros()
+                        part_weight = 0
+            if part_weight:
+                parts.append((store, part))
+
+        routes = self.model.route_planner.plan(
+            [
+                (store.name, catalog.weight(products), store.arrival_calendar)
+                for store, products in parts
+            ],
+            max_capacity,
+        )
 
-                        # Обновляем активные заказы
-                        if store.name not in self.active_orders:
-                            self.active_orders[store.name] = {}
-                        for product, amount in available_products.items():
-                            current = self.active_orders[store.name].get(product, 0)
-                            self.active_orders[store.name][product] = current + amount
+        loads = [
+            sum(catalog.weight(parts[index][1]) for index in route) for route in routes
+        ]
+        assignment = assign_vehicles(loads, [vehicle.capacity for vehicle in idle])
+
+        delivered = {}
+        for route_index, vehicle_index in assignment:
+            vehicle, route = idle[vehicle_index], routes[route_index]
+            stops = []
+            for index in route:
+                store, products = parts[index]
+                if stops and stops[-1][0] is store:
+                    stop_products = stops[-1][1]
+                    for product_id, amount in enumerate(products):
+                        stop_products[product_id] += amount
+                else:
+                    stops.append((store, list(products)))
+            stops = self.fit_stops(stops, vehicle.capacity, catalog)
+            if not stops or not vehicle.load_route(stops):
+                continue
 
-                        # Если все потребности удовлетворены, выходим из цикла
-                        if not remaining_needs:
-                            break
+            for store, products in stops:
+                if not quiet:
+                    print(
+                        f"-> Машина {vehicle.unique_id} загружена для {store.name}: "
+                        f"{catalog.as_dict(products)}"
+                    )
+                orders_in_delivery = self.active_orders.setdefault(
+                    store.name, catalog.zeros()
+                )
+                store_delivered = delivered.setdefault(store, catalog.zeros())
+                for product_id, amount in enumerate(products):
+                    self.stock[product_id] -= amount
+                    orders_in_delivery[product_id] += amount
+                    store_delivered[product_id] += amount
+
+        if delivered:
+            self.model.mark_dirty(self)
+
+        # Если остались невыполненные потребности - сохраняем их
+        for store, products in orders.items():
+            sent = delivered.get(store)
+            remaining = (
+                [max(0, amount - done) for amount, done in zip(products, sent)]
+                if sent
+                else list(products)
+            )
+            if any(remaining):
+                if sent and not quiet:
+                    print(
+                        f"-> Осталось доставить в {store.name}: {catalog.as_dict(remaining)}"
+                    )
+                self.set_pending(store, remaining)
+            else:
+                self.drop_pending(store.name)
+        return delivered
+
+    @staticmethod
+    def fit_stops(stops, capacity, catalog):
+        """Уменьшение груза с конца маршрута до грузоподъемности машины
+
+        Убираются только последние остановки, поэтому время прибытия
+        в оставшиеся магазины не меняется.
+        """
+        excess = sum(catalog.weight(products) for _, products in stops) - capacity
+        while excess > 0 and stops:
+            store, products = stops[-1]
+            for product_id in reversed(range(len(products))):
+                if not products[product_id]:
+                    continue
+                cut = min(
+                    products[product_id], catalog.units_covering(product_id, excess)
+                )
+                products[product_id] -= cut
+                excess -= cut * catalog.weights[product_id]
+                if excess <= 0:
+                    break
+            if not any(products):
+                stops.pop()
+        return stops
 
-        if deliveries_made:
-            # Если остались невыполненные потребности - сохраняем их
-            if remaining_needs:
-                print(f"-> Осталось доставить: {remaining_needs}")
-                if store.name not in self.pending_stores:
-                    self.pending_stores[store.name] = {}
-                for product, amount in remaining_needs.items():
-                    current = self.pending_stores[store.name].get(product, 0)
-                    self.pending_stores[store.name][product] = current + amount
-            return True
-        else:
-            print("-> Нет свободных машин")
-            return False
+    def get_active_orders(self) -> dict:
+        """Активные заказы в виде {магазин: {товар: количество}}"""
+        return {
+            store_name: self.catalog.as_dict(orders)
+            for store_name, orders in self.active_orders.items()
+        }
 
     # В классе WarehouseAgent добавим метод очистки выполненного заказа
     def clear_completed_order(self, store):
         """Очистка выполненного заказа"""
         if store.name in self.active_orders:
-            print(f"\nОчистка информации о завершенной доставке для {store.name}")
-            print(f"Было активных заказов: {self.active_orders}")
+            self.model.mark_dirty(self)
+            quiet = self.model.quiet
+            if not quiet:
+                print(f"\nОчистка информации о завершенной доставке для {store.name}")
+                print(f"Было активных заказов: {self.get_active_orders()}")
             del self.active_orders[store.name]
-            print(f"Стало активных заказов: {self.active_orders}")
-        if store.name in self.pending_stores:
-            del self.pending_stores[store.name]
+            if not quiet:
+                print(f"Стало активных заказов: {self.get_active_orders()}")
+        self.drop_pending(store.name)
 
     # В методе complete_delivery класса WarehouseAgent изменим логику
     def complete_delivery(self, store, products):
         """Завершение доставки"""
-        print(f"\nЗавершение доставки для {store.name}")
-        print(f"Доставлено: {products}")
+        if not self.model.quiet:
+            print(f"\nЗавершение доставки для {store.name}")
+            print(f"Доставлено: {products}")
 
         # Очищаем заказ после успешной доставки
         self.clear_completed_order(store)
@@ -279,91 +391,139 @@ class WarehouseAgent(Agent):
 class StoreAgent(Agent):
     def __init__(self, unique_id, model, delivery_windows, product_requirements):
         super().__init__(unique_id, model)
+        self.rng = model.spawn_rng()
         self.name = None
         self.delivery_windows = delivery_windows
-        self.product_requirements = product_requirements
-        self.inventory = {product: 0 for product in product_requirements}
-        self.expected_deliveries = {}
+        # Окна, скомпилированные в недельный календарь, и календарь прибытия
+        # машин (окна, открытые на EARLY_ARRIVAL_MINUTES раньше)
+        self.calendar = DeliveryCalendar(delivery_windows)
+        self.arrival_calendar = self.calendar.widened(EARLY_ARRIVAL_MINUTES)
+        # Ожидаемые поставки - вектор количеств по каталогу model.catalog
+        self.catalog = model.catalog
+        self.expected_deliveries = self.catalog.zeros()
         self.awaiting_vehicle = None
 
+        self.product_requirements = product_requirements
+        # (товар, номер в каталоге, норма) для расчета заказа
+        self.product_ids = [
+            (product, self.catalog.id_of(product), required)
+            for product, required in product_requirements.items()
+        ]
+
+        # В векторном режиме запасы - строка общей матрицы модели
+        # (требования не меняются и дублируются в матрице для расчетов)
+        inventory_matrix = getattr(model, "inventory_matrix", None)
+        if inventory_matrix is not None:
+            self.inventory_row = inventory_matrix.add_row(product_requirements)
+            self.inventory = inventory_matrix.row_view(self.inventory_row)
+        else:
+            self.inventory_row = None
+            self.inventory = {product: 0 for product in product_requirements}
+
     def step(self):
         """Один шаг симуляции для магазина"""
-        # Сначала расходуем товары
-        self.consume_products()
+        # Сначала расходуем товары (в векторном режиме расход считает модель)
+        if self.inventory_row is None:
+            self.consume_products()
 
         # Проверяем текущие запасы
-        print(f"\n[{self.name}] Запасы: {self.inventory}")
+        if not self.model.quiet:
+            print(f"\n[{self.name}] Запасы: {self.inventory}")
 
         # Если запасы ниже 80% от требуемого - делаем заказ
-        if not self.awaiting_vehicle:
-            for product, required in self.product_requirements.items():
-                current = self.inventory.get(product, 0)
-                if current < (required * 0.8):  # Порог в 80%
-                    needed_products = self.check_inventory_and_make_order()
-                    if needed_products:
-                        print(
-                            f"-> Требуется пополнить: {', '.join(f'{p}:{q}' for p, q in needed_products.items())}"
-                        )
-                        order_status = self.model.warehouse.process_order(
-                            self, needed_products
-                        )
-                        if order_status:
-                            self.model.log_event(
-                                "store_needs",
-                                self.name,
-                                "Требуется доставка",
-                                f"Требуется доставка: {needed_products}",
-                                "pending",
-                            )
-                    break
+        if not self.awaiting_vehicle and self.needs_reorder():
+            needed_products = self.check_inventory_and_make_order()
+            if needed_products:
+                if not self.model.quiet:
+                    needed = self.catalog.as_dict(needed_products)
+                    print(
+                        f"-> Требуется пополнить: {', '.join(f'{p}:{q}' for p, q in needed.items())}"
+                    )
+                order_status = self.model.warehouse.process_order(
+                    self, needed_products
+                )
+                if order_status:
+                    self.model.log_event(
+                        "store_needs",
+                        self.name,
+                        "Требуется доставка",
+                        "Требуется доставка: {}",
+                        "pending",
+                        self.catalog.as_dict(needed_products),
+                    )
+
+    def needs_reorder(self):
+        """Есть ли товар с запасом ниже порога заказа (по умолчанию 80% нормы)"""
+        if self.inventory_row is not None:
+            return self.model.inventory_matrix.needs_reorder(self.inventory_row)
+
+        for product, required in self.product_requirements.items():
+            current = self.inventory.get(product, 0)
+            if current < (required * self.model.reorder_trigger):
+                return True
+        return False
 
     def check_inventory_and_make_order(self):
-        """Проверка запасов и формирование заказа"""
-        needed_products = {}
+        """Проверка запасов и формирование заказа
+
+        Возвращает вектор недостающих товаров или None.
+        """
+        if self.inventory_row is not None:
+            return self.model.inventory_matrix.get_order(self.inventory_row)
+
+        needed_products = None
 
         # Проверяем каждый продукт
-        for product, required in self.product_requirements.items():
+        for product, product_id, required in self.product_ids:
             current = self.inventory.get(product, 0)
 
-            # Если текущий запас меньше 70% от требуемого
-            if current < (required * 0.7):
-                needed_amount = required - current
-                needed_products[product] = needed_amount
+            # Если текущий запас меньше reorder_level от требуемого (70% по умолчанию)
+            if current < (required * self.model.reorder_level):
+                if needed_products is None:
+                    needed_products = self.catalog.zeros()
+                needed_products[product_id] = required - current
 
-        return needed_products if needed_products else None
+        return needed_products
 
     def consume_products(self):
         """Расход товаров"""
         # 55% шанс что магазин будет тратить товары
-        if random.random() < 0.55:
+        if self.rng.random() < 0.55:
             consumption_happened = False
+            quiet = self.model.quiet
             used_products = []
 
             for product in list(self.inventory.keys()):
                 current_amount = self.inventory[product]
                 if current_amount > 0:
                     # 50% шанс что конкретный товар будет потрачен
-                    if random.random() < 0.5:
+                    if self.rng.random() < 0.5:
                         # Расходуем 20% от текущего количества
                         consumption = max(1, int(current_amount * 0.2))
                         if consumption > current_amount:
                             consumption = current_amount
 
                         self.inventory[product] = current_amount - consumption
-                        used_products.append(
-                            f"{product}: -{consumption} (было: {current_amount}, стало: {self.inventory[product]})"
-                        )
+                        if not quiet:
+                            used_products.append(
+                                f"{product}: -{consumption} (было: {current_amount}, стало: {self.inventory[product]})"
+                            )
                         consumption_happened = True
 
                         self.model.log_event(
                             "product_consumption",
                             self.name,
                             "Расход товаров",
-                            f"Расход {product}: {consumption} (осталось: {self.inventory[product]})",
+                            "Расход {}: {} (осталось: {})",
                             "consumed",
+                            product,
+                            consumption,
+                            self.inventory[product],
                         )
 
             if consumption_happened:
+                self.model.mark_dirty(self)
+            if consumption_happened and not quiet:
                 print(f"\nРасход товаров в {self.name}")
                 for msg in used_products:
                     print(msg)
@@ -396,100 +556,208 @@ class StoreAgent(Agent):
         return True
 
     def add_expected_delivery(self, products, vehicle_id):
-        """Добавление информации об ожидаемой поставке"""
-        self.expected_deliveries.update(products)
+        """Добавление информации об ожидаемой поставке (products - вектор)"""
+        for product_id, amount in enumerate(products):
+            if amount:
+                self.expected_deliveries[product_id] = amount
         self.awaiting_vehicle = vehicle_id
+        self.model.mark_dirty(self)
         self.model.log_event(
             "delivery_waiting",
             self.name,
             f"Ожидание поставки",
-            f"Ожидается машина {vehicle_id} с товарами: {products}",
+            f"Ожидается машина {vehicle_id} с товарами: {self.catalog.as_dict(products)}",
             "waiting",
         )
 
     def receive_delivery(self, products):
-        """Прием доставки"""
-        print(f"\nПрием доставки в {self.name}")
+        """Прием доставки (products - вектор количеств)"""
+        quiet = self.model.quiet
+        if not quiet:
+            print(f"\nПрием доставки в {self.name}")
 
         # Проверяем, не превысим ли максимальные уровни
-        proposed_inventory = self.inventory.copy()
-        for product, amount in products.items():
-            proposed_inventory[product] = proposed_inventory.get(product, 0) + amount
+        names = self.catalog.names
+        proposed_inventory = {}
+        for product_id, amount in enumerate(products):
+            if not amount:
+                continue
+            product = names[product_id]
+            proposed_inventory[product] = self.inventory.get(product, 0) + amount
 
             if proposed_inventory[product] > self.product_requirements[product]:
-                print(
-                    f"Отказ в приеме доставки: превышение требуемого количества {product}"
-                )
-                print(f"Текущий запас: {self.inventory[product]}")
-                print(f"Пытаемся добавить: {amount}")
-                print(f"Максимальный уровень: {self.product_requirements[product]}")
+                if not quiet:
+                    print(
+                        f"Отказ в приеме доставки: превышение требуемого количества {product}"
+                    )
+                    print(f"Текущий запас: {self.inventory[product]}")
+                    print(f"Пытаемся добавить: {amount}")
+                    print(f"Максимальный уровень: {self.product_requirements[product]}")
                 return False
 
         # Если все проверки пройдены - принимаем доставку
-        print(f"Текущие запасы: {self.inventory}")
-        print(f"Получено: {products}")
+        if not quiet:
+            print(f"Текущие запасы: {self.inventory}")
+            print(f"Получено: {self.catalog.as_dict(products)}")
 
-        for product, amount in products.items():
-            self.inventory[product] = proposed_inventory[product]
+        expected = self.expected_deliveries
+        for product_id, amount in enumerate(products):
+            if not amount:
+                continue
+            self.inventory[names[product_id]] = proposed_inventory[names[product_id]]
             # Уменьшаем ожидаемые поставки
-            if product in self.expected_deliveries:
-                self.expected_deliveries[product] = max(
-                    0, self.expected_deliveries[product] - amount
-                )
-                if self.expected_deliveries[product] == 0:
-                    del self.expected_deliveries[product]
+            expected[product_id] = max(0, expected[product_id] - amount)
 
         # Если все доставлено, очищаем информацию об ожидании
-        if not self.expected_deliveries:
+        if not any(expected):
             self.awaiting_vehicle = None
+        self.model.mark_dirty(self)
 
-        print(f"Новые запасы: {self.inventory}")
+        if not quiet:
+            print(f"Новые запасы: {self.inventory}")
         return True
 
 
 class VehicleAgent(Agent):
+    # Машина работает только по событиям прибытия и возврата
+    event_driven = True
+
     def __init__(self, unique_id, model, capacity):
         super().__init__(unique_id, model)
-        self.capacity = capacity  # Общая вместимость
-        self.current_load = {}  # Текущий груз
+        # Поток машины сейчас не используется, но порождается, чтобы потоки
+        # агентов, созданных после нее, не зависели от версии модели
+        self.rng = model.spawn_rng()
+        self.name = f"vehicle_{unique_id}"
+        self.capacity = capacity  # Грузоподъемность (вес по каталогу товаров)
+        self.catalog = model.catalog
+        self.load = self.catalog.zeros()  # Текущий груз: вектор количеств
         self.destination = None  # Пункт назначения
+        self.route = []  # Оставшиеся остановки маршрута: [(магазин, вектор)]
         self.status = "idle"
+        self.start_time = None
+        self.arrival_time = None
         self.pos = None
 
+        # Показатели: пробег и занятость в шагах модели
+        self.distance_travelled = 0
+        self.busy_ticks = 0
+        self.trip_start_tick = None
+
+    def get_busy_ticks(self):
+        """Количество шагов в рейсах, включая текущий рейс"""
+        if self.trip_start_tick is None:
+            return self.busy_ticks
+        return self.busy_ticks + self.model.ticks - self.trip_start_tick
+
+    def set_status(self, status: str):
+        """Смена состояния машины (учитывается в списке свободных машин)"""
+        self.status = status
+        self.model.update_idle(self)
+
+    def get_progress(self):
+        """Ход текущего рейса: (процент пути, осталось минут) или None
+
+        Считается только по запросу - на шаге модели машина в пути
+        не обрабатывается.
+        """
+        if self.arrival_time is None or self.start_time is None:
+            return None
+        remaining_minutes = max(0, int(self.arrival_time - self.model.current_time))
+        total_trip_minutes = int(self.arrival_time - self.start_time)
+        if total_trip_minutes <= 0:
+            return 100, 0
+        progress = int(
+            ((total_trip_minutes - remaining_minutes) / total_trip_minutes) * 100
+        )
+        return progress, remaining_minutes
+
+    @property
+    def current_load(self):
+        """Текущий груз в виде {товар: количество} (для вывода и снимков)"""
+        return self.catalog.as_dict(self.load)
+
     def get_current_load_weight(self):
         """Получить текущий вес груза"""
-        return sum(self.current_load.values())
+        return self.catalog.weight(self.load)
 
     def load_delivery(self, products, destination_store):
-        """Загрузка товаров для доставки"""
-        print(f"[Машина {self.unique_id}] Загрузка для {destination_store.name}")
-        print(f"-> Заказано: {products}")
-        print(
-            f"-> Доступная вместимость: {self.capacity - self.get_current_load_weight()}"
-        )
+        """Загрузка товаров для доставки в один магазин"""
+        return self.load_route([(destination_store, products)])
+
+    def load_route(self, stops):
+        """Загрузка товаров для маршрута по нескольким магазинам
+
+        stops - список (магазин, вектор количеств) в порядке объезда.
+        """
+        quiet = self.model.quiet
+        destination_store = stops[0][0]
+        products = self.catalog.zeros()
+        for _, stop_products in stops:
+            for product_id, amount in enumerate(stop_products):
+                products[product_id] += amount
+
+        if not quiet:
+            route_names = " -> ".join(store.name for store, _ in stops)
+            print(f"[Машина {self.unique_id}] Загрузка для маршрута: {route_names}")
+            print(f"-> Заказано: {self.catalog.as_dict(products)}")
+            print(
+                f"-> Доступная вместимость: {self.capacity - self.get_current_load_weight()}"
+            )
 
         # Получаем расстояние из матрицы расстояний
-        distance = self.model.data["distances"]["склад"][destination_store.name]
+        distance = self.model.scheduler.get_distance("склад", destination_store.name)
 
-        self.current_load = products
+        self.route = [(store, list(stop_products)) for store, stop_products in stops]
+        self.load = products
         self.destination = destination_store
-        self.status = "en_route"
+        self.set_status("en_route")
         self.start_time = self.model.current_time
-
-        # Рассчитываем время прибытия (3 минуты на километр)
-        travel_minutes = distance * 3
-        self.arrival_time = self.start_time + timedelta(minutes=travel_minutes)
-
-        print(f"-> Загружено и отправлено: {products}")
-        print(f"-> Расстояние: {distance} км")
-        print(f"-> Расчетное время в пути: {travel_minutes} минут")
-        print(f"-> Время выезда: {self.start_time.strftime('%H:%M')}")
-        print(f"-> Ожидаемое прибытие: {self.arrival_time.strftime('%H:%M')}")
-
-        # Уведомляем магазин о предстоящей доставке
-        destination_store.add_expected_delivery(products, self.unique_id)
+        self.distance_travelled += distance
+        if self.trip_start_tick is None:
+            self.trip_start_tick = self.model.ticks
+        self.model.mark_dirty(self)
+
+        # Рассчитываем время прибытия (minutes_per_km минут на километр)
+        travel_minutes = distance * self.model.minutes_per_km
+        self.arrival_time = self.start_time + travel_minutes
+        self.model.schedule_vehicle(self)
+
+        if not quiet:
+            print(f"-> Загружено и отправлено: {self.catalog.as_dict(products)}")
+            print(f"-> Расстояние: {distance} км")
+            print(f"-> Расчетное время в пути: {travel_minutes} минут")
+            print(f"-> Время выезда: {format_minutes(self.start_time)}")
+            print(f"-> Ожидаемое прибытие: {format_minutes(self.arrival_time)}")
+
+        # Уведомляем магазины о предстоящей доставке
+        for store, stop_products in self.route:
+            store.add_expected_delivery(stop_products, self.unique_id)
         return True
 
+    def next_stop(self, delivered_products):
+        """Переезд к следующему магазину маршрута после разгрузки"""
+        for product_id, amount in enumerate(delivered_products):
+            self.load[product_id] = max(0, self.load[product_id] - amount)
+
+        previous = self.destination
+        self.destination = self.route[0][0]
+        distance = self.model.scheduler.get_distance(previous.name, self.destination.name)
+        travel_minutes = distance * self.model.minutes_per_km
+
+        # Следующий переезд отсчитывается от прибытия в предыдущий магазин,
+        # как в плане маршрута
+        self.start_time = self.arrival_time
+        self.arrival_time = self.start_time + travel_minutes
+        self.distance_travelled += distance
+        self.model.deliveries_completed += 1
+        self.model.mark_dirty(self)
+        self.model.schedule_vehicle(self)
+
+        if not self.model.quiet:
+            print(f"-> Следующий магазин: {self.destination.name}")
+            print(f"-> Расстояние: {distance} км")
+            print(f"-> Ожидаемое прибытие: {format_minutes(self.arrival_time)}")
+
     def optimize_load(self, requested_products):
         """Оптимизация загрузки с учетом вместимости"""
         if self.capacity <= 0:
@@ -517,75 +785,74 @@ class VehicleAgent(Agent):
         return optimized_load
 
     def step(self):
-        """Один шаг симуляции для транспортного средства"""
+        """Переход машины в следующее состояние
+
+        Модель вызывает step() только на шаге, когда наступило время
+        прибытия или возврата (см. DeliveryModel.schedule_vehicle), поэтому
+        машины в пути и свободные машины на шаге ничего не стоят.
+        """
         current_time = self.model.current_time
+        quiet = self.model.quiet
 
         if self.status == "en_route":
             # Проверяем, прибыли ли мы по времени
             if self.arrival_time and current_time >= self.arrival_time:
-                print(f"\n[Машина {self.unique_id}] Прибыла к {self.destination.name}")
+                if not quiet:
+                    print(
+                        f"\n[Машина {self.unique_id}] Прибыла к {self.destination.name}"
+                    )
 
                 # Пытаемся разгрузиться
-                if self.destination.receive_delivery(self.current_load):
-                    print(f"-> Доставка выполнена: {self.current_load}")
+                stop_products = self.route[0][1]
+                if self.destination.receive_delivery(stop_products):
+                    if not quiet:
+                        print(
+                            f"-> Доставка выполнена: {self.catalog.as_dict(stop_products)}"
+                        )
 
                     # Очищаем информацию о доставке на складе
                     self.model.warehouse.clear_completed_order(self.destination)
 
+                    self.route.pop(0)
+                    if self.route:
+                        self.next_stop(stop_products)
+                        return
+
                     # Получаем расстояние до склада из матрицы расстояний
-                    return_distance = self.model.data["distances"][
-                        self.destination.name
-                    ]["склад"]
-                    return_minutes = return_distance * 3  # 3 минуты на километр
+                    return_distance = self.model.scheduler.get_distance(
+                        self.destination.name, "склад"
+                    )
+                    return_minutes = return_distance * self.model.minutes_per_km
 
-                    self.current_load = {}
-                    self.status = "returning"
+                    self.load = self.catalog.zeros()
+                    self.set_status("returning")
                     self.start_time = current_time
-                    self.arrival_time = current_time + timedelta(minutes=return_minutes)
-
-                    print(f"-> Возвращается на склад")
-                    print(f"-> Расстояние до склада: {return_distance} км")
-                    print(
-                        f"-> Расчетное время возвращения: {self.arrival_time.strftime('%H:%M')}"
-                    )
-                else:
+                    self.distance_travelled += return_distance
+                    self.model.deliveries_completed += 1
+                    self.model.mark_dirty(self)
+                    self.arrival_time = current_time + return_minutes
+                    self.model.schedule_vehicle(self)
+
+                    if not quiet:
+                        print(f"-> Возвращается на склад")
+                        print(f"-> Расстояние до склада: {return_distance} км")
+                        print(
+                            f"-> Расчетное время возвращения: {format_minutes(self.arrival_time)}"
+                        )
+                elif not quiet:
                     print(f"-> Доставка отклонена")
-            else:
-                # Находимся в процессе движения
-                remaining_minutes = int(
-                    (self.arrival_time - current_time).total_seconds() / 60
-                )
-                total_trip_minutes = int(
-                    (self.arrival_time - self.start_time).total_seconds() / 60
-                )
-                progress = int(
-                    ((total_trip_minutes - remaining_minutes) / total_trip_minutes)
-                    * 100
-                )
-
-                print(f"\n[Машина {self.unique_id}] В пути к {self.destination.name}")
-                print(f"-> Груз: {self.current_load}")
-                print(f"-> Прогресс: {progress}%")
-                print(f"-> Осталось: {remaining_minutes} минут")
-                print(f"-> Прибытие в {self.arrival_time.strftime('%H:%M')}")
 
         elif self.status == "returning":
             if current_time >= self.arrival_time:
-                print(f"\n[Машина {self.unique_id}] Вернулась на склад")
-                self.status = "idle"
+                if not quiet:
+                    print(f"\n[Машина {self.unique_id}] Вернулась на склад")
+                self.set_status("idle")
                 self.destination = None
                 self.start_time = None
                 self.arrival_time = None
-            else:
-                remaining_minutes = int(
-                    (self.arrival_time - current_time).total_seconds() / 60
-                )
-                print(f"\n[Машина {self.unique_id}] Возвращается на склад")
-                print(f"-> Прибытие через {remaining_minutes} минут")
-
-        elif self.status == "idle":
-            if random.random() < 0.1:
-                print(f"\n[Машина {self.unique_id}] Готова к новым заказам")
+                self.busy_ticks += self.model.ticks - self.trip_start_tick
+                self.trip_start_tick = None
+                self.model.mark_dirty(self)
 
     def complete_delivery(self):
         """Завершение доставки с учетом временных окон"""
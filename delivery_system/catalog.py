@@ -0,0 +1,122 @@
+# delivery_system/catalog.py
+import math
+
+# Вес и объем единицы товара, если они не заданы в исходных данных:
+# вес в тех же единицах, что и вместимость машин
+DEFAULT_WEIGHT = 1
+DEFAULT_VOLUME = 1
+
+# Погрешность деления дробных весов (2.06 / 1.03 не должно дать 1.999...)
+EPSILON = 1e-9
+
+
+class ProductCatalog:
+    """Каталог товаров: название -> плотный целочисленный номер
+
+    Номера выдаются по порядку первого упоминания товара, поэтому столбцы
+    матриц запасов (InventoryMatrix) и векторы количеств всех агентов
+    используют одну нумерацию. Строки названий хранятся один раз.
+
+    Вектор количеств - список длины len(catalog), где элемент i - количество
+    товара с номером i. Склад, заказы, машины и доставки передают между
+    собой такие векторы; словари {название: количество} строятся только
+    для вывода и снимков состояния (as_dict, named).
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        self.weights = []
+        self.volumes = []
+        for name in names:
+            self.intern(name)
+
+    @classmethod
+    def from_data(cls, data: dict) -> "ProductCatalog":
+        """Каталог по исходным данным
+
+        Необязательный раздел "products" задает вес и объем единицы товара:
+        {"молоко": {"weight": 1.03, "volume": 1}}. Затем добавляются товары
+        магазинов и склада, которых нет в этом разделе.
+        """
+        catalog = cls()
+        for name, properties in data.get("products", {}).items():
+            catalog.intern(
+                name,
+                properties.get("weight", DEFAULT_WEIGHT),
+                properties.get("volume", DEFAULT_VOLUME),
+            )
+        for store_data in data["stores"]:
+            for name in store_data["product_requirements"]:
+                catalog.intern(name)
+        for name in data["склад"]["inventory"]:
+            catalog.intern(name)
+        return catalog
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def intern(
+        self, name: str, weight=DEFAULT_WEIGHT, volume=DEFAULT_VOLUME
+    ) -> int:
+        """Номер товара (новый товар добавляется в конец каталога)"""
+        product_id = self.ids.get(name)
+        if product_id is None:
+            if weight <= 0:
+                raise ValueError(f"Product {name} must have a positive weight")
+            product_id = len(self.names)
+            self.names.append(name)
+            self.ids[name] = product_id
+            self.weights.append(weight)
+            self.volumes.append(volume)
+        return product_id
+
+    def id_of(self, name: str) -> int:
+        """Номер известного товара (KeyError для неизвестного)"""
+        return self.ids[name]
+
+    def name_of(self, product_id: int) -> str:
+        """Название товара по номеру"""
+        return self.names[product_id]
+
+    def zeros(self) -> list:
+        """Нулевой вектор количеств"""
+        return [0] * len(self.names)
+
+    def vector(self, products: dict) -> list:
+        """Словарь {название: количество} -> вектор количеств"""
+        vector = [0] * len(self.names)
+        for name, amount in products.items():
+            vector[self.ids[name]] = amount
+        return vector
+
+    def as_dict(self, vector) -> dict:
+        """Ненулевые количества вектора в виде {название: количество}"""
+        names = self.names
+        return {names[i]: amount for i, amount in enumerate(vector) if amount}
+
+    def named(self, vector) -> dict:
+        """Все количества вектора в виде {название: количество}"""
+        return dict(zip(self.names, vector))
+
+    def weight(self, vector):
+        """Вес груза"""
+        return sum(amount * weight for amount, weight in zip(vector, self.weights))
+
+    def volume(self, vector):
+        """Объем груза"""
+        return sum(amount * volume for amount, volume in zip(vector, self.volumes))
+
+    def units_within(self, product_id: int, weight) -> int:
+        """Сколько единиц товара помещается в вес weight"""
+        return max(0, math.floor(weight / self.weights[product_id] + EPSILON))
+
+    def units_covering(self, product_id: int, weight) -> int:
+        """Сколько единиц товара нужно убрать, чтобы снять вес weight"""
+        return max(0, math.ceil(weight / self.weights[product_id] - EPSILON))
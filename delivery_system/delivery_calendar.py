@@ -0,0 +1,229 @@
+# delivery_system/delivery_calendar.py
+import bisect
+from array import array
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Допустимое раннее прибытие: магазин принимает машину за 15 минут до окна
+EARLY_ARRIVAL_MINUTES = 15
+
+WEEKDAYS = {
+    "пн": 0,
+    "вт": 1,
+    "ср": 2,
+    "чт": 3,
+    "пт": 4,
+    "сб": 5,
+    "вс": 6,
+    "mon": 0,
+    "tue": 1,
+    "wed": 2,
+    "thu": 3,
+    "fri": 4,
+    "sat": 5,
+    "sun": 6,
+}
+WEEKDAY_NAMES = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+
+
+def parse_time(value) -> int:
+    """Время окна в минутах от начала суток: 9 (часы) или "9:30" """
+    if isinstance(value, str):
+        hours, _, minutes = value.partition(":")
+        return int(hours) * 60 + int(minutes or 0)
+    return int(value * 60)
+
+
+def format_time(minutes: int) -> str:
+    """Минуты от начала суток в виде "9:00" """
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def weekday_index(day) -> int:
+    """Номер дня недели (0 - понедельник): "пн", "mon" или число"""
+    key = str(day).lower()
+    return WEEKDAYS[key] if key in WEEKDAYS else int(key)
+
+
+def describe_windows(windows) -> str:
+    """Список окон в виде "9:00-12:00, 14:00-17:00" """
+    return ", ".join(
+        f"{format_time(parse_time(start))}-{format_time(parse_time(end))}"
+        for start, end in windows
+    )
+
+
+class DeliveryCalendar:
+    """Скомпилированный недельный календарь окон доставки
+
+    Окна задаются списком [начало, конец] (одинаково для всех дней) или
+    словарем {день недели: список окон}. Границы - часы (9) или строки
+    "9:30"; окно с концом раньше начала ([22, 2]) переходит через полночь.
+    При создании окна переводятся в отсортированный массив непересекающихся
+    интервалов в минутах недели, поэтому запросы выполняются бинарным
+    поиском за O(log n). Время в запросах - минуты от понедельника 00:00
+    любой недели (значения больше недели допустимы). Границы хранятся в
+    array (целые или, после сдвига на дробное время, вещественные), чтобы
+    календари тысяч магазинов занимали мало памяти.
+
+    Окно через полночь с воскресенья на понедельник хранится двумя
+    интервалами ([x, неделя) и [0, y)), запросы продолжают его через
+    границу недели. Пустые окна ([16, 16]) в интервалы не входят: их
+    моменты открытия хранятся в empty, и только widened() превращает их
+    в окна раннего прибытия.
+    """
+
+    __slots__ = ("windows", "starts", "ends", "empty")
+
+    def __init__(self, windows=(), intervals=None, empty=None):
+        self.windows = windows
+        if intervals is None:
+            intervals, empty = self._compile(windows)
+        self.starts = self._bounds([start for start, _ in intervals])
+        self.ends = self._bounds([end for _, end in intervals])
+        # Минуты недели пустых окон (None - пустых окон нет)
+        self.empty = self._bounds(empty) if empty else None
+
+    @staticmethod
+    def _bounds(values):
+        typecode = "l" if all(isinstance(value, int) for value in values) else "d"
+        return array(typecode, values)
+
+    @staticmethod
+    def _compile(windows):
+        if isinstance(windows, dict):
+            days = {
+                weekday_index(day): day_windows for day, day_windows in windows.items()
+            }
+        else:
+            days = {day: windows for day in range(7)}
+
+        intervals = []
+        empty = []
+        for day, day_windows in days.items():
+            for window_start, window_end in day_windows:
+                start = parse_time(window_start)
+                end = parse_time(window_end)
+                offset = day * MINUTES_PER_DAY
+                # Пустое окно ([16, 16]) не открывается: машину в нем
+                # принимают только за 15 минут до открытия (см. widened)
+                if end == start:
+                    empty.append((offset + start) % MINUTES_PER_WEEK)
+                    continue
+                if end < start:
+                    end += MINUTES_PER_DAY
+                intervals.append((offset + start, offset + end))
+        return DeliveryCalendar._normalize(intervals), sorted(set(empty))
+
+    @staticmethod
+    def _normalize(intervals):
+        """Перенос интервалов в пределы недели и слияние пересекающихся
+
+        Пустые интервалы отбрасываются.
+        """
+        wrapped = []
+        for start, end in intervals:
+            if end <= start:
+                continue
+            if end - start >= MINUTES_PER_WEEK:
+                return [(0, MINUTES_PER_WEEK)]
+            start_in_week = start % MINUTES_PER_WEEK
+            end_in_week = start_in_week + (end - start)
+            if end_in_week > MINUTES_PER_WEEK:
+                wrapped.append((start_in_week, MINUTES_PER_WEEK))
+                wrapped.append((0, end_in_week - MINUTES_PER_WEEK))
+            else:
+                wrapped.append((start_in_week, end_in_week))
+
+        merged = []
+        for start, end in sorted(wrapped):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def shifted(self, minutes) -> "DeliveryCalendar":
+        """Календарь, сдвинутый на minutes (например, на время в пути)"""
+        return DeliveryCalendar(
+            self.windows,
+            self._normalize(
+                [(start + minutes, end + minutes) for start, end in self.intervals()]
+            ),
+            [(moment + minutes) % MINUTES_PER_WEEK for moment in self.empty or ()],
+        )
+
+    def widened(self, before) -> "DeliveryCalendar":
+        """Календарь, в котором каждое окно открывается на before минут раньше
+
+        Пустое окно становится окном [начало - before, начало).
+        """
+        intervals = [(start - before, end) for start, end in self.intervals()]
+        intervals += [(moment - before, moment) for moment in self.empty or ()]
+        return DeliveryCalendar(self.windows, self._normalize(intervals))
+
+    def intervals(self):
+        """Интервалы календаря в минутах недели"""
+        return list(zip(self.starts, self.ends))
+
+    def _locate(self, minutes):
+        """Номер интервала, начавшегося не позже minutes, и минута недели"""
+        moment = minutes % MINUTES_PER_WEEK
+        return bisect.bisect_right(self.starts, moment) - 1, moment
+
+    def is_open(self, minutes) -> bool:
+        """Открыто ли окно в момент minutes"""
+        index, moment = self._locate(minutes)
+        return index >= 0 and moment < self.ends[index]
+
+    def _end(self, index):
+        """Конец интервала index; окно через конец недели продолжается в [0, y)"""
+        end = self.ends[index]
+        if end == MINUTES_PER_WEEK and index and self.starts[0] == 0:
+            end += self.ends[0]
+        return end
+
+    def next_opening(self, minutes):
+        """Ближайший момент не раньше minutes, когда окно открыто (или None)"""
+        if not self.starts:
+            return None
+        index, moment = self._locate(minutes)
+        if index >= 0 and moment < self.ends[index]:
+            return minutes
+        if index + 1 < len(self.starts):
+            return minutes + self.starts[index + 1] - moment
+        return minutes + self.starts[0] + MINUTES_PER_WEEK - moment
+
+    def closing_time(self, minutes):
+        """Момент закрытия текущего окна (None, если сейчас закрыто)"""
+        index, moment = self._locate(minutes)
+        if index >= 0 and moment < self.ends[index]:
+            return minutes + self._end(index) - moment
+        return None
+
+    def next_closing(self, minutes):
+        """Ближайший момент закрытия окна не раньше minutes (или None)"""
+        if not self.starts:
+            return None
+        moment = minutes % MINUTES_PER_WEEK
+        if moment == 0 and self.ends[-1] == MINUTES_PER_WEEK and self.starts[0]:
+            # Окно закрылось ровно в конце прошлой недели
+            return minutes
+        index = bisect.bisect_left(self.ends, moment)
+        if index < len(self.ends):
+            return minutes + self._end(index) - moment
+        return minutes + self.ends[0] + MINUTES_PER_WEEK - moment
+
+    def describe(self) -> str:
+        """Окна в виде текста: "9:00-12:00, 14:00-17:00" или по дням недели"""
+        if isinstance(self.windows, dict):
+            return "; ".join(
+                f"{WEEKDAY_NAMES[weekday_index(day)]} {describe_windows(day_windows)}"
+                for day, day_windows in self.windows.items()
+            )
+        return describe_windows(self.windows)
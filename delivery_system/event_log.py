@@ -0,0 +1,280 @@
+# delivery_system/event_log.py
+import csv
+import os
+import shutil
+from enum import IntEnum
+from typing import Optional
+import numpy as np
+
+# Начальная емкость буфера событий, дальше удваивается
+INITIAL_CAPACITY = 1024
+# Размер порции при сбросе лога на диск
+DEFAULT_SPILL_CHUNK = 65536
+
+CSV_COLUMNS = ["timestamp", "event_type", "agent_id", "event_desc", "details", "status"]
+
+
+class EventType(IntEnum):
+    """Типы событий системы доставки"""
+
+    STORE_STATUS = 0
+    STORE_NEEDS = 1
+    VEHICLE_STATUS = 2
+    DELIVERY_REQUEST = 3
+    DELIVERY_WAITING = 4
+    DELIVERY_COMPLETE = 5
+    PRODUCT_CONSUMPTION = 6
+
+    @property
+    def label(self) -> str:
+        """Строковое имя типа, как в CSV (например, delivery_complete)"""
+        return self.name.lower()
+
+    @classmethod
+    def from_label(cls, label: str) -> "EventType":
+        return cls[label.upper()]
+
+
+def format_minutes(minutes: int) -> str:
+    """Время в минутах от начала первого дня -> "HH:MM" или "день N, HH:MM" """
+    day, minutes = divmod(int(minutes), 24 * 60)
+    if day:
+        return f"день {day + 1}, {minutes // 60:02d}:{minutes % 60:02d}"
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def format_details(details) -> str:
+    """Текст подробностей события: строка или пара (шаблон, аргументы)"""
+    if isinstance(details, tuple):
+        template, args = details
+        return template.format(*args)
+    return details
+
+
+class EventLog:
+    """Колоночный журнал событий модели
+
+    События хранятся в заранее выделенных массивах: время в минутах,
+    код типа, индексы интернированных строк (агент, описание, статус)
+    и подробности (текст или пара (шаблон, аргументы), которая
+    превращается в текст только при чтении, см. format_details).
+    Размер ограничивается двумя способами: max_events - кольцевой буфер
+    из последних событий, spill_file - сброс заполненного буфера в
+    CSV-файл. Итерация проходит сброшенные события из файла, затем
+    события в памяти; вытесненные из кольцевого буфера события не
+    сохраняются, но учитываются в счетчиках totals и dropped.
+    """
+
+    def __init__(
+        self, max_events: Optional[int] = None, spill_file: Optional[str] = None
+    ):
+        self.max_events = max_events
+        self.spill_file = spill_file
+        self.spilled = 0  # сколько событий уже сброшено на диск
+        self.dropped = 0  # сколько событий вытеснено из кольцевого буфера
+        # Количество событий каждого типа за все время (с учетом
+        # сброшенных и вытесненных)
+        self.totals = np.zeros(len(EventType), dtype=np.int64)
+
+        if spill_file:
+            capacity = max_events or DEFAULT_SPILL_CHUNK
+        else:
+            capacity = max_events or INITIAL_CAPACITY
+        self._allocate(capacity)
+        self._start = 0
+        self._count = 0
+
+        # Таблица интернированных строк
+        self._strings = []
+        self._string_ids = {}
+
+        if spill_file and os.path.exists(spill_file):
+            os.remove(spill_file)
+
+    def _allocate(self, capacity: int):
+        self.timestamps = np.zeros(capacity, dtype=np.int32)
+        self.event_types = np.zeros(capacity, dtype=np.int8)
+        self.agent_ids = np.zeros(capacity, dtype=np.int32)
+        self.descriptions = np.zeros(capacity, dtype=np.int32)
+        self.statuses = np.zeros(capacity, dtype=np.int32)
+        self.details = np.empty(capacity, dtype=object)
+
+    def _grow(self):
+        """Удвоение емкости буфера (только для неограниченного журнала)"""
+        old = (
+            self.timestamps,
+            self.event_types,
+            self.agent_ids,
+            self.descriptions,
+            self.statuses,
+            self.details,
+        )
+        self._allocate(len(self.timestamps) * 2)
+        for new_array, old_array in zip(
+            (
+                self.timestamps,
+                self.event_types,
+                self.agent_ids,
+                self.descriptions,
+                self.statuses,
+                self.details,
+            ),
+            old,
+        ):
+            new_array[: len(old_array)] = old_array
+
+    def intern(self, value: str) -> int:
+        """Индекс строки в таблице интернированных строк"""
+        index = self._string_ids.get(value)
+        if index is None:
+            index = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = index
+        return index
+
+    def __len__(self):
+        return self._count
+
+    def append(
+        self,
+        timestamp: int,
+        event_type,
+        agent_id: str,
+        event_desc: str,
+        details: str,
+        status: str,
+    ):
+        """Добавление события"""
+        capacity = len(self.timestamps)
+        if self._count == capacity:
+            if self.spill_file:
+                self.flush()
+            elif self.max_events:
+                # Кольцевой буфер: перезаписываем самое старое событие
+                self._start = (self._start + 1) % capacity
+                self._count -= 1
+                self.dropped += 1
+            else:
+                self._grow()
+                capacity = len(self.timestamps)
+
+        if isinstance(event_type, str):
+            event_type = EventType.from_label(event_type)
+
+        position = (self._start + self._count) % capacity
+        self.timestamps[position] = timestamp
+        self.event_types[position] = event_type
+        self.agent_ids[position] = self.intern(agent_id)
+        self.descriptions[position] = self.intern(event_desc)
+        self.statuses[position] = self.intern(status)
+        self.details[position] = details
+        self._count += 1
+        self.totals[event_type] += 1
+
+    def _order(self):
+        """Индексы событий в буфере от старых к новым"""
+        return (self._start + np.arange(self._count)) % len(self.timestamps)
+
+    def total(self, event_type) -> int:
+        """Количество событий заданного типа за все время работы журнала"""
+        if isinstance(event_type, str):
+            event_type = EventType.from_label(event_type)
+        return int(self.totals[event_type])
+
+    def count(self, event_type) -> int:
+        """Количество событий заданного типа в памяти"""
+        if isinstance(event_type, str):
+            event_type = EventType.from_label(event_type)
+        if self._start == 0:
+            return int(np.count_nonzero(self.event_types[: self._count] == event_type))
+        return int(np.count_nonzero(self.event_types[self._order()] == event_type))
+
+    def records(self):
+        """События в виде словарей (timestamp, event_type, ...) по порядку"""
+        strings = self._strings
+        for index in self._order().tolist():
+            yield {
+                "timestamp": format_minutes(self.timestamps[index]),
+                "event_type": EventType(self.event_types[index]).label,
+                "agent_id": strings[self.agent_ids[index]],
+                "event_desc": strings[self.descriptions[index]],
+                "details": format_details(self.details[index]),
+                "status": strings[self.statuses[index]],
+            }
+
+    def spilled_records(self):
+        """События, уже сброшенные в spill_file, по порядку"""
+        if not self.spilled:
+            return
+        with open(self.spill_file, encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+
+    def __iter__(self):
+        """Все сохраненные события: сначала из spill_file, затем из памяти"""
+        yield from self.spilled_records()
+        yield from self.records()
+
+    def __getitem__(self, index):
+        return list(self.records())[index]
+
+    def clear(self):
+        """Очистка событий в памяти"""
+        self._start = 0
+        self._count = 0
+        self.details[:] = None
+
+    def flush(self):
+        """Сброс событий из памяти в spill_file"""
+        if not self.spill_file:
+            raise ValueError("EventLog has no spill_file")
+        # Пустой сброс ничего не пишет: заголовок пишется вместе с первыми
+        # событиями, поэтому spilled == 0 означает, что файла еще нет
+        if not self._count:
+            return
+        write_header = self.spilled == 0
+        with open(self.spill_file, "a", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(self.records())
+        self.spilled += self._count
+        self.clear()
+
+    def to_dataframe(self):
+        """Экспорт событий из памяти в pandas.DataFrame"""
+        import pandas as pd
+
+        order = self._order()
+        categories = self._strings
+
+        def strings_column(codes):
+            return pd.Categorical.from_codes(codes[order], categories=categories)
+
+        return pd.DataFrame(
+            {
+                "timestamp": [format_minutes(t) for t in self.timestamps[order]],
+                "event_type": pd.Categorical.from_codes(
+                    self.event_types[order],
+                    categories=[event_type.label for event_type in EventType],
+                ),
+                "agent_id": strings_column(self.agent_ids),
+                "event_desc": strings_column(self.descriptions),
+                "details": [format_details(details) for details in self.details[order]],
+                "status": strings_column(self.statuses),
+                "minutes": self.timestamps[order],
+            }
+        )
+
+    def to_csv(self, filename: str):
+        """Экспорт событий в CSV в формате results.csv"""
+        if self.spill_file:
+            # Полный журнал - это уже сброшенная часть плюс остаток в памяти
+            self.flush()
+            if self.spilled:
+                if os.path.abspath(filename) != os.path.abspath(self.spill_file):
+                    shutil.copyfile(self.spill_file, filename)
+                return
+        with open(filename, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.records())
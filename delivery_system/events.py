@@ -0,0 +1,54 @@
+# delivery_system/events.py
+import heapq
+import itertools
+
+# Типы событий транспорта
+VEHICLE_ARRIVAL = "vehicle_arrival"
+VEHICLE_RETURN = "vehicle_return"
+
+# Статус машины -> тип события, которым завершается текущий рейс
+VEHICLE_EVENT_TYPES = {
+    "en_route": VEHICLE_ARRIVAL,
+    "returning": VEHICLE_RETURN,
+}
+
+
+class EventQueue:
+    """Очередь событий, упорядоченная по модельному времени"""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, time, event_type, agent):
+        """Добавление события"""
+        heapq.heappush(self._heap, (time, next(self._counter), event_type, agent))
+
+    def push_vehicle(self, vehicle):
+        """Добавление события прибытия/возврата машины по её arrival_time"""
+        event_type = VEHICLE_EVENT_TYPES.get(vehicle.status)
+        if event_type and vehicle.arrival_time is not None:
+            self.push(vehicle.arrival_time, event_type, vehicle)
+
+    def peek_time(self):
+        """Время ближайшего события или None"""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, time):
+        """Извлечение всех актуальных событий, наступивших к моменту time
+
+        Устаревшие записи (машина уже сменила рейс) отбрасываются лениво.
+        Возвращает множество агентов, у которых есть событие.
+        """
+        due = set()
+        while self._heap and self._heap[0][0] <= time:
+            event_time, _, event_type, agent = heapq.heappop(self._heap)
+            if (
+                VEHICLE_EVENT_TYPES.get(agent.status) == event_type
+                and agent.arrival_time == event_time
+            ):
+                due.add(agent)
+        return due
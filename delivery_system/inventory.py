@@ -0,0 +1,227 @@
+# delivery_system/inventory.py
+import itertools
+from collections.abc import MutableMapping
+import numpy as np
+
+# Начальная емкость матрицы (строк), дальше удваивается
+INITIAL_ROWS = 16
+
+
+class InventoryMatrix:
+    """Запасы и требования всех магазинов в виде матриц магазины x товары
+
+    Столбцы - номера товаров из общего каталога ProductCatalog. Количества
+    хранятся в int32: запас магазина на порядки меньше 2**31.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.products = catalog.names
+        self.product_index = catalog.ids
+        self.size = 0
+
+        shape = (INITIAL_ROWS, len(self.products))
+        self.levels = np.zeros(shape, dtype=np.int32)
+        self.requirements = np.zeros(shape, dtype=np.int32)
+        self.stocked = np.zeros(shape, dtype=bool)  # ассортимент магазина
+        self.active = np.zeros(INITIAL_ROWS, dtype=bool)
+
+        # Пороги заказа, пересчитываемые одним проходом на шаг:
+        # флаг "пора заказывать" и недостающее количество по каждому товару
+        self.trigger = 0.8
+        self.reorder = 0.7
+        self._reorder_rows = []
+        self._order_amounts = []
+        # Строки, изменившиеся после последнего пересчета порогов
+        self.stale = np.ones(INITIAL_ROWS, dtype=bool)
+
+    def _grow(self):
+        """Удвоение емкости матриц"""
+        rows = len(self.active) * 2
+        for name in (
+            "levels",
+            "requirements",
+            "stocked",
+            "active",
+            "stale",
+        ):
+            old = getattr(self, name)
+            new = np.zeros((rows,) + old.shape[1:], dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+        self.stale[self.size :] = True
+
+    def add_row(self, requirements) -> int:
+        """Добавление магазина, возвращает номер его строки"""
+        if self.size == len(self.active):
+            self._grow()
+        row = self.size
+        self.size += 1
+        for product, required in requirements.items():
+            column = self.product_index[product]
+            self.requirements[row, column] = required
+            self.stocked[row, column] = True
+        self.active[row] = True
+        self.stale[row] = True
+        return row
+
+    def remove_row(self, row: int):
+        """Исключение строки магазина из расчетов"""
+        self.levels[row] = 0
+        self.requirements[row] = 0
+        self.stocked[row] = False
+        self.active[row] = False
+        self.stale[row] = True
+
+    def consume(self, draws):
+        """Расход товаров во всех магазинах одной операцией
+
+        draws - случайные числа шага формы (магазины, 1 + товары): первый
+        столбец решает, тратит ли магазин товары (55%), остальные - тратится
+        ли конкретный товар (50%). Расход - 20% от текущего запаса
+        (минимум 1). Возвращает матрицу расхода.
+        """
+        size = self.size
+        levels = self.levels[:size]
+        spends = draws[:, 0] < 0.55
+        picked = draws[:, 1:] < 0.5
+        mask = picked & spends[:, None] & (levels > 0) & self.stocked[:size]
+
+        consumption = np.maximum(1, (levels * 0.2).astype(levels.dtype))
+        consumption = np.where(mask, np.minimum(consumption, levels), 0)
+        levels -= consumption
+        self.stale[:size] = True
+        return consumption
+
+    def refresh_thresholds(self):
+        """Пересчет порогов заказа для всех магазинов"""
+        size = self.size
+        levels = self.levels[:size]
+        requirements = self.requirements[:size]
+        stocked = self.stocked[:size]
+        self._reorder_rows = (
+            ((levels < requirements * self.trigger) & stocked).any(axis=1).tolist()
+        )
+        order_cells = (levels < requirements * self.reorder) & stocked
+        self._order_amounts = np.where(
+            order_cells, requirements - levels, 0
+        ).tolist()
+        self.stale[:size] = False
+
+    def _refresh_row(self, row: int):
+        """Пересчет порогов для одной изменившейся строки"""
+        levels = self.levels[row].tolist()
+        requirements = self.requirements[row].tolist()
+        stocked = self.stocked[row].tolist()
+        self._reorder_rows[row] = any(
+            is_stocked and level < required * self.trigger
+            for level, required, is_stocked in zip(levels, requirements, stocked)
+        )
+        self._order_amounts[row] = [
+            required - level
+            if is_stocked and level < required * self.reorder
+            else 0
+            for level, required, is_stocked in zip(levels, requirements, stocked)
+        ]
+        self.stale[row] = False
+
+    def _check_row(self, row: int):
+        if row >= len(self._reorder_rows):
+            self.refresh_thresholds()
+        elif self.stale[row]:
+            self._refresh_row(row)
+
+    def needs_reorder(self, row: int) -> bool:
+        """Есть ли в магазине товар ниже порога срабатывания заказа"""
+        self._check_row(row)
+        return self._reorder_rows[row]
+
+    def get_order(self, row: int):
+        """Вектор заказа: недостающее до полного запаса количество товаров
+        ниже порога заказа (None, если заказывать нечего)"""
+        self._check_row(row)
+        needed = self._order_amounts[row]
+        return list(needed) if any(needed) else None
+
+    def row_levels(self, row: int) -> dict:
+        """Запасы магазина в виде {товар: количество} (копия строки)"""
+        stocked = self.stocked[row]
+        return dict(
+            zip(
+                itertools.compress(self.products, stocked.tolist()),
+                self.levels[row][stocked].tolist(),
+            )
+        )
+
+    def rows_below(self, share: float):
+        """Маска строк, в которых есть товар ниже доли share нормы"""
+        size = self.size
+        return (
+            (self.levels[:size] < self.requirements[:size] * share)
+            & self.stocked[:size]
+        ).any(axis=1)
+
+    def status_marks(self):
+        """Значки уровня запасов (>=80%, >=30%, ниже) для всех ячеек"""
+        size = self.size
+        levels = self.levels[:size]
+        requirements = self.requirements[:size]
+        percentages = np.divide(
+            levels * 100,
+            requirements,
+            out=np.zeros(levels.shape),
+            where=requirements > 0,
+        )
+        return np.select(
+            [percentages >= 80, percentages >= 30], ["✅", "⚠️"], default="❗"
+        )
+
+    def row_view(self, row: int, matrix_name: str = "levels"):
+        """Словарь товар -> количество поверх строки матрицы"""
+        return InventoryRow(self, row, matrix_name)
+
+
+class InventoryRow(MutableMapping):
+    """Строка матрицы запасов с интерфейсом словаря"""
+
+    __slots__ = ("_inventory", "_row", "_matrix_name")
+
+    def __init__(self, inventory, row, matrix_name):
+        self._inventory = inventory
+        self._row = row
+        self._matrix_name = matrix_name
+
+    def _column(self, product):
+        column = self._inventory.product_index.get(product)
+        if column is None or not self._inventory.stocked[self._row, column]:
+            raise KeyError(product)
+        return column
+
+    def __getitem__(self, product):
+        matrix = getattr(self._inventory, self._matrix_name)
+        return int(matrix[self._row, self._column(product)])
+
+    def __setitem__(self, product, amount):
+        matrix = getattr(self._inventory, self._matrix_name)
+        matrix[self._row, self._column(product)] = amount
+        self._inventory.stale[self._row] = True
+
+    def __delitem__(self, product):
+        raise TypeError("Products cannot be removed from a store inventory")
+
+    def __iter__(self):
+        stocked = self._inventory.stocked[self._row]
+        return (
+            product
+            for product, column in self._inventory.product_index.items()
+            if stocked[column]
+        )
+
+    def __len__(self):
+        return int(self._inventory.stocked[self._row].sum())
+
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.copy())
@@ -1,27 +1,139 @@
 # delivery_system/model.py
 import json
 import csv
-from datetime import datetime, timedelta
-import random
+import itertools
+from typing import Optional
+import numpy as np
 from mesa import Model
 from mesa.time import RandomActivation
 from .agents import WarehouseAgent, StoreAgent, VehicleAgent
+from .catalog import ProductCatalog
+from .delivery_calendar import MINUTES_PER_DAY
+from .event_log import EventLog, EventType, format_details, format_minutes
+from .events import EventQueue
+from .inventory import InventoryMatrix
+from .report import ReportWriter
+from .rng import RandomStream
+from .routing import DEFAULT_MOVE_BUDGET, RoutePlanner
+from .sinks import FileLogSink
+from .snapshot import SnapshotPublisher
 from .scheduler import DeliveryScheduler
 
 
+DEFAULT_LOG_FILE = "data/simulation_log.txt"
 
-class DeliveryModel(Model):
-    def __init__(self, input_file: str):
-        super().__init__()
-        self.delivery_log = []
+# Рабочий день модели: с 09:00 до 23:45, ночь пропускается
+DAY_START_MINUTES = 9 * 60
+DAY_END_MINUTES = 23 * 60 + 45
+# Длительность шага, минуты
+TIME_STEP_MINUTES = 15
 
-        # Добавляем модельное время
-        self.current_time = datetime.strptime("09:00", "%H:%M")
-        self.time_step = timedelta(minutes=15)
 
-        # Загрузка данных
-        with open(input_file, "r", encoding="utf-8") as f:
-            self.data = json.load(f)
+class DeliveryModel(Model):
+    def __init__(
+        self,
+        input_file: Optional[str],
+        quiet: bool = False,
+        log_file: Optional[str] = None,
+        vectorized: bool = False,
+        max_log_events: Optional[int] = None,
+        log_spill_file: Optional[str] = None,
+        report_file: Optional[str] = None,
+        seed: Optional[int] = None,
+        data: Optional[dict] = None,
+        reorder_trigger: float = 0.8,
+        reorder_level: float = 0.7,
+        minutes_per_km: float = 3,
+        fleet_size: Optional[int] = None,
+        vehicle_capacity: Optional[int] = None,
+        route_move_budget: int = DEFAULT_MOVE_BUDGET,
+        route_time_budget: Optional[float] = None,
+    ):
+        super().__init__()
+        # Параметры политики заказов и транспорта:
+        # reorder_trigger - доля нормы, ниже которой магазин делает заказ,
+        # reorder_level - доля нормы, ниже которой товар попадает в заказ,
+        # minutes_per_km - время в пути на километр,
+        # fleet_size и vehicle_capacity - замена парка машин из исходных данных,
+        # route_move_budget - число ходов улучшения маршрутов за вызов,
+        # route_time_budget - необязательная граница того же улучшения по
+        # времени, секунды: маршруты тогда зависят от скорости машины,
+        # поэтому вместе с seed она не допускается
+        if seed is not None and route_time_budget is not None:
+            raise ValueError(
+                "route_time_budget makes seeded runs irreproducible, "
+                "use route_move_budget instead"
+            )
+        self.reorder_trigger = reorder_trigger
+        self.reorder_level = reorder_level
+        self.minutes_per_km = minutes_per_km
+        self.fleet_size = fleet_size
+        self.vehicle_capacity = vehicle_capacity
+
+        # Каждый агент получает независимый поток случайных чисел,
+        # порожденный от общего seed (см. spawn_rng)
+        self.seed = seed
+        self.seed_sequence = np.random.SeedSequence(seed)
+        # Журнал событий: max_log_events - хранить только последние события,
+        # log_spill_file - сбрасывать заполненный журнал в CSV
+        self.delivery_log = EventLog(max_log_events, log_spill_file)
+
+        # Потоковый отчет: события пишутся в файл по мере появления
+        self.report = ReportWriter(report_file, self) if report_file else None
+
+        # Векторный режим: запасы всех магазинов в общей матрице,
+        # расход и пороги заказа считаются одной операцией на шаг
+        self.vectorized = vectorized
+        self.inventory_matrix = None
+
+        # Тихий режим: без вывода в консоль и без лога на диске,
+        # если не подключен ни один приемник лога
+        self.quiet = quiet
+        self.log_sinks = []
+        self._default_sink = None
+        if log_file:
+            self.attach_sink(FileLogSink(log_file))
+
+        # Номер шага, агенты, состояние которых изменилось с последней
+        # записи лога, и счетчик изменений состава сети
+        self.ticks = 0
+        self.dirty_agents = set()
+        self.structure_version = 0
+
+        # Показатели работы (см. get_kpis)
+        self.deliveries_completed = 0
+        self.stockout_cell_ticks = 0
+
+        # Индекс машин по времени следующего перехода (прибытие или
+        # возврат): на шаге обрабатываются только машины, время которых
+        # наступило. Свободные машины - в idle_vehicles (машина -> номер
+        # в парке, чтобы порядок совпадал с self.vehicles)
+        self.events = EventQueue()
+        self._due_vehicles = set()
+        self.idle_vehicles = {}
+        self._fleet_counter = itertools.count()
+
+        # Неизменяемый снимок состояния после последнего шага (см.
+        # enable_snapshots): читатели из других потоков берут ссылку
+        # self.snapshot, модель подменяет ее целиком
+        self.snapshot = None
+        self._snapshots = None
+
+        # Планировщик создается после агентов
+        self.scheduler = None
+
+        # Модельное время - целое число минут от 00:00 первого дня
+        # (первый день - понедельник), строка времени кешируется на шаг
+        self.current_time = DAY_START_MINUTES
+        self.time_step = TIME_STEP_MINUTES
+        self._time_str = None
+        self._time_str_minutes = None
+
+        # Загрузка данных (готовые данные можно передать через data)
+        if data is None:
+            with open(input_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        self.data = data
 
         # Инициализируем агентов
         self.init_agents()
@@ -30,100 +142,392 @@ class DeliveryModel(Model):
         self.scheduler = DeliveryScheduler(self)
         self.scheduler.generate_schedule()
 
-        # Очищаем файл лога при старте
-        with open("data/simulation_log.txt", "w", encoding="utf-8") as f:
-            f.write("СИСТЕМА ДОСТАВКИ - ЛОГ РАБОТЫ\n")
-            f.write("=" * 80 + "\n\n")
+        # Таблица расстояний нужна только для матриц планировщика; данные
+        # вызывающего кода не меняются, ссылка на таблицу просто не хранится
+        self.data = {
+            key: value for key, value in self.data.items() if key != "distances"
+        }
+
+        # Планировщик развозных маршрутов по нескольким магазинам
+        self.route_planner = RoutePlanner(
+            self, route_move_budget, route_time_budget
+        )
+
+        # Лог по умолчанию (data/simulation_log.txt) создается при старте
+        if not self.quiet and not self.log_sinks:
+            self._default_sink = FileLogSink(DEFAULT_LOG_FILE)
+
+        # Начальные события записываются с исходным состоянием
+        if self.report:
+            self.report.end_step()
+
+    def attach_sink(self, sink):
+        """Подключение приемника снимков состояния"""
+        self.log_sinks.append(sink)
+
+    def detach_sink(self, sink):
+        """Отключение приемника снимков состояния (приемник закрывается)"""
+        self.log_sinks.remove(sink)
+        sink.close()
+
+    def close(self):
+        """Закрытие лога и отчета"""
+        for sink in self.log_sinks:
+            sink.close()
+        if self._default_sink:
+            self._default_sink.close()
+        self.close_report()
 
     def write_to_log(self):
-        """Запись текущего состояния в файл лога"""
-        with open("data/simulation_log.txt", "a", encoding="utf-8") as f:
-            # Записываем временную метку
-            f.write(f"\n🕒 ВРЕМЯ: {self.get_time_str()}\n")
-            f.write("-" * 80 + "\n")
-
-            # Записываем состояние магазинов
-            f.write("\n📦 СОСТОЯНИЕ МАГАЗИНОВ:\n")
-            for store in self.stores:
-                f.write(f"\n  🏪 {store.name}:\n")
-                # Запасы
-                f.write("    Текущие запасы:\n")
-                for product, amount in store.inventory.items():
-                    required = store.product_requirements[product]
+        """Запись текущего состояния в подключенные приемники лога"""
+        sinks = self.log_sinks
+        if not sinks and not self.quiet:
+            # Без явных приемников лог пишется в файл по умолчанию,
+            # но только вне тихого режима
+            if self._default_sink is None:
+                self._default_sink = FileLogSink(DEFAULT_LOG_FILE)
+            sinks = (self._default_sink,)
+
+        for sink in sinks:
+            sink.write_state(self)
+        self.dirty_agents.clear()
+
+    def collect_kpis(self):
+        """Учет показателей за шаг: ячейки магазин-товар с нулевым запасом"""
+        if self.inventory_matrix is not None:
+            matrix = self.inventory_matrix
+            size = matrix.size
+            self.stockout_cell_ticks += int(
+                np.count_nonzero((matrix.levels[:size] <= 0) & matrix.stocked[:size])
+            )
+        else:
+            self.stockout_cell_ticks += sum(
+                1
+                for store in self.stores
+                for amount in store.inventory.values()
+                if amount <= 0
+            )
+
+    def get_kpis(self) -> dict:
+        """Показатели прогона: доставки, минуты дефицита, пробег, загрузка машин"""
+        step_minutes = self.time_step
+        vehicle_ticks = len(self.vehicles) * self.ticks
+        busy_ticks = sum(vehicle.get_busy_ticks() for vehicle in self.vehicles)
+        return {
+            "deliveries_completed": self.deliveries_completed,
+            "stockout_minutes": self.stockout_cell_ticks * step_minutes,
+            "km_driven": sum(vehicle.distance_travelled for vehicle in self.vehicles),
+            "vehicle_utilization": busy_ticks / vehicle_ticks if vehicle_ticks else 0.0,
+        }
+
+    def mark_dirty(self, agent):
+        """Отметка агента, состояние которого изменилось на текущем шаге"""
+        self.dirty_agents.add(agent)
+
+    def get_agent_state(self, agent) -> dict:
+        """Состояние агента в виде словаря для снимков"""
+        if isinstance(agent, StoreAgent):
+            return {
+                "inventory": dict(agent.inventory),
+                "awaiting_vehicle": agent.awaiting_vehicle,
+            }
+        if isinstance(agent, VehicleAgent):
+            return {
+                "status": agent.status,
+                "destination": agent.destination.name if agent.destination else None,
+                "current_load": dict(agent.current_load),
+            }
+        return {
+            "inventory": dict(agent.inventory),
+            "active_orders": agent.get_active_orders(),
+        }
+
+    def get_network_state(self) -> dict:
+        """Полное состояние сети: магазины, машины и склад"""
+        return {
+            "stores": {
+                store.name: self.get_agent_state(store) for store in self.stores
+            },
+            "vehicles": {
+                str(vehicle.unique_id): self.get_agent_state(vehicle)
+                for vehicle in self.vehicles
+            },
+            "warehouse": self.get_agent_state(self.warehouse),
+        }
+
+    def format_state(self) -> str:
+        """Текстовое состояние сети для лога (магазины, транспорт, склад)"""
+        lines = []
+
+        # Записываем состояние магазинов
+        lines.append("\n📦 СОСТОЯНИЕ МАГАЗИНОВ:")
+        status_marks = (
+            self.inventory_matrix.status_marks()
+            if self.inventory_matrix is not None
+            else None
+        )
+        for store in self.stores:
+            lines.append(f"\n  🏪 {store.name}:")
+            # Запасы
+            lines.append("    Текущие запасы:")
+            for product, amount in store.inventory.items():
+                required = store.product_requirements[product]
+                if status_marks is not None:
+                    status = status_marks[
+                        store.inventory_row,
+                        self.inventory_matrix.product_index[product],
+                    ]
+                else:
                     percentage = (amount / required * 100) if required > 0 else 0
                     status = (
                         "✅" if percentage >= 80 else "⚠️" if percentage >= 30 else "❗"
                     )
-                    f.write(f"      • {product}: {amount}/{required} {status}\n")
-                # Окна доставки
-                f.write(
-                    f"    Окна доставки: {', '.join(f'{start}:00-{end}:00' for start, end in store.delivery_windows)}\n"
-                )
+                lines.append(f"      • {product}: {amount}/{required} {status}")
+            # Окна доставки
+            lines.append(
+                f"    Окна доставки: {store.calendar.describe()}"
+            )
 
-            # Записываем состояние транспорта
-            f.write("\n🚚 СОСТОЯНИЕ ТРАНСПОРТА:\n")
-            for vehicle in self.vehicles:
-                status_text = {
-                    "idle": "ожидает",
-                    "en_route": "в пути",
-                    "returning": "возвращается",
-                }.get(vehicle.status, vehicle.status)
-
-                load_info = (
-                    ", ".join(
-                        f"{product}: {amount}"
-                        for product, amount in vehicle.current_load.items()
-                    )
-                    if vehicle.current_load
-                    else "пусто"
-                )
+        # Записываем состояние транспорта
+        lines.append("\n🚚 СОСТОЯНИЕ ТРАНСПОРТА:")
+        for vehicle in self.vehicles:
+            status_text = {
+                "idle": "ожидает",
+                "en_route": "в пути",
+                "returning": "возвращается",
+            }.get(vehicle.status, vehicle.status)
 
-                destination_text = (
-                    f" к {vehicle.destination.name}" if vehicle.destination else ""
-                )
-                f.write(
-                    f"  • Машина #{vehicle.unique_id}: {status_text}{destination_text}\n"
+            load_info = (
+                ", ".join(
+                    f"{product}: {amount}"
+                    for product, amount in vehicle.current_load.items()
                 )
-                f.write(f"    Загрузка: {load_info} (максимум: {vehicle.capacity})\n")
+                if vehicle.current_load
+                else "пусто"
+            )
+
+            destination_text = (
+                f" к {vehicle.destination.name}" if vehicle.destination else ""
+            )
+            lines.append(
+                f"  • Машина #{vehicle.unique_id}: {status_text}{destination_text}"
+            )
+            lines.append(f"    Загрузка: {load_info} (максимум: {vehicle.capacity})")
 
-            # Записываем состояние склада
-            f.write("\n📦 СОСТОЯНИЕ СКЛАДА:\n")
-            for product, amount in self.warehouse.inventory.items():
-                f.write(f"  • {product}: {amount}\n")
+        # Записываем состояние склада
+        lines.append("\n📦 СОСТОЯНИЕ СКЛАДА:")
+        for product, amount in self.warehouse.inventory.items():
+            lines.append(f"  • {product}: {amount}")
 
-            # Активные заказы
-            if self.warehouse.active_orders:
-                f.write("\n📋 АКТИВНЫЕ ЗАКАЗЫ:\n")
-                for store_name, orders in self.warehouse.active_orders.items():
-                    f.write(f"  • {store_name}: {orders}\n")
+        # Активные заказы
+        if self.warehouse.active_orders:
+            lines.append("\n📋 АКТИВНЫЕ ЗАКАЗЫ:")
+            for store_name, orders in self.warehouse.get_active_orders().items():
+                lines.append(f"  • {store_name}: {orders}")
 
-            f.write("\n" + "=" * 80 + "\n")
+        return "\n".join(lines)
+
+    def advance_time(self):
+        """Продвижение модельного времени на один шаг"""
+        self.current_time += self.time_step
+        self.ticks += 1
+
+        # В конце рабочего дня переходим к 09:00 следующего дня
+        minute_of_day = self.current_time % MINUTES_PER_DAY
+        if minute_of_day >= DAY_END_MINUTES:
+            self.current_time += MINUTES_PER_DAY - minute_of_day + DAY_START_MINUTES
+
+    def consume_inventory(self):
+        """Расход товаров во всех магазинах одной операцией (векторный режим)"""
+        matrix = self.inventory_matrix
+        consumption = matrix.consume(self.draw_consumption())
+        matrix.refresh_thresholds()
+
+        # Одна запись в логе на магазин, у которого был расход
+        for row in np.flatnonzero(consumption.any(axis=1)):
+            store = self.stores_by_row[row]
+            self.mark_dirty(store)
+            used = {
+                matrix.products[column]: int(consumption[row, column])
+                for column in np.flatnonzero(consumption[row])
+            }
+            self.log_event(
+                "product_consumption",
+                store.name,
+                "Расход товаров",
+                "Расход: {} (осталось: {})",
+                "consumed",
+                used,
+                matrix.row_levels(row),
+            )
+            if not self.quiet:
+                print(f"\nРасход товаров в {store.name}: {used}")
 
     def step(self):
         """Один шаг симуляции"""
         # Продвигаем время на один шаг
-        self.current_time += self.time_step
+        self.advance_time()
+
+        # Машины, у которых наступило время прибытия или возврата
+        self._due_vehicles = self.events.pop_due(self.current_time)
+        self.process_step()
 
-        # Если прошли сутки, начинаем новый день
-        if self.current_time.hour >= 23 and self.current_time.minute >= 45:
-            self.current_time = datetime.strptime("09:00", "%H:%M")
+    def process_step(self, skip_idle_stores: bool = False):
+        """Работа агентов на текущем шаге (время уже продвинуто)
 
-        print(f"\nМодельное время: {self.get_time_str()}")
+        skip_idle_stores - не вызывать магазины, которым на шаге нечего
+        делать (см. idle_stores).
+        """
+        if not self.quiet:
+            print(f"\nМодельное время: {self.get_time_str()}")
 
-        # Используем scheduler
-        self.scheduler.step()
-        self.simulate_events()
+        if self.inventory_matrix is not None:
+            self.consume_inventory()
+
+        idle = self.idle_stores() if skip_idle_stores else None
+        stores = (
+            [store for store in self.stores if store not in idle] if idle else None
+        )
+
+        # Используем scheduler: магазины - на каждом шаге, машины - по событиям
+        self.scheduler.step(due=self._due_vehicles, idle=idle)
+        self.simulate_events(stores)
+
+        # Все заказы шага распределяются по машинам одним планом
+        self.warehouse.dispatch_orders()
+
+        # Отклоненная доставка остается в пути и повторяется на следующем шаге
+        for vehicle in self._due_vehicles:
+            if self.vehicles_by_id.get(vehicle.unique_id) is vehicle:
+                self.events.push_vehicle(vehicle)
+        self._due_vehicles = set()
+
+        self.collect_kpis()
+        if self._snapshots is not None:
+            self.publish_snapshot()
 
         # Записываем текущее состояние в лог
         self.write_to_log()
+        if self.report:
+            self.report.end_step()
+
+    def step_events(self):
+        """Один шаг в событийном режиме
+
+        Как step(), но вызываются только агенты с событиями на шаге:
+        машины - по времени прибытия и возврата, магазины (в векторном
+        режиме) - только если у них есть товар ниже порога заказа (см.
+        idle_stores). Шаги без магазинов и без событий машин
+        проматываются без работы. Порядок активации и случайные числа
+        совпадают с обычным режимом step().
+
+        Часы не перескакивают через шаги с магазинами: магазин с запасом
+        расходует товары на каждом шаге (случайно, с записью в журнал),
+        а магазин ниже порога повторяет заказ на каждом шаге, поэтому
+        таких шагов без событий не бывает.
+        """
+        self.advance_time()
+
+        self._due_vehicles = self.events.pop_due(self.current_time)
+        if not self._due_vehicles and not self.stores:
+            if self._snapshots is not None:
+                self.publish_snapshot()
+            return
+        self.process_step(skip_idle_stores=True)
+
+    def idle_stores(self):
+        """Магазины, которым на текущем шаге нечего делать (множество)
+
+        В векторном режиме расход уже посчитан матрицей, а шаг магазина
+        только заказывает товары ниже порога (reorder_trigger для
+        заказа на шаге, reorder_level - в simulate_events). Магазин без
+        таких товаров ничего не делает, а доставка на шаге может только
+        поднять запасы. В обычном режиме каждый магазин на каждом шаге
+        тянет случайные числа своего потока на расход, поэтому
+        пропускать магазины нельзя (пустое множество).
+        """
+        matrix = self.inventory_matrix
+        if matrix is None:
+            return set()
+        busy = matrix.rows_below(max(matrix.trigger, matrix.reorder))
+        stores_by_row = self.stores_by_row
+        return {
+            stores_by_row[row]
+            for row in np.flatnonzero(~busy & matrix.active[: matrix.size]).tolist()
+        }
+
+    def enable_snapshots(self):
+        """Публикация снимка состояния после каждого шага (self.snapshot)"""
+        if self._snapshots is None:
+            self._snapshots = SnapshotPublisher(self)
+            self.snapshot = self._snapshots.publish(full=True)
+
+    def publish_snapshot(self):
+        """Сборка снимка текущего шага и подмена self.snapshot"""
+        self.snapshot = self._snapshots.publish()
+
+    def schedule_vehicle(self, vehicle):
+        """Регистрация нового времени прибытия машины в очереди событий"""
+        if vehicle.arrival_time is not None and vehicle.arrival_time <= self.current_time:
+            # Событие уже наступило - машина обрабатывается на текущем шаге
+            self._due_vehicles.add(vehicle)
+        else:
+            self.events.push_vehicle(vehicle)
+
+    def run(
+        self,
+        steps: Optional[int] = None,
+        quiet: Optional[bool] = None,
+        mode: str = "tick",
+        until: Optional[int] = None,
+    ):
+        """Прогон симуляции на заданное число шагов
+
+        quiet=True включает режим без вывода в консоль и без записи
+        состояния на диск (если файл лога не задан явно).
+        mode="event" включает событийный режим (см. step_events).
+        until - вместо числа шагов: моделировать, пока модельное время
+        меньше until минут (например, 3 * MINUTES_PER_DAY - три дня).
+        """
+        if quiet is not None:
+            self.quiet = quiet
+        if mode == "tick":
+            step = self.step
+        elif mode == "event":
+            step = self.step_events
+        else:
+            raise ValueError(f"Unknown simulation mode: {mode}")
+        if until is not None:
+            while self.current_time < until:
+                step()
+            return
+        for _ in range(steps):
+            step()
 
     def init_agents(self):
         """Инициализация всех агентов"""
+        # Общий каталог товаров: номера товаров для матриц и векторов
+        self.catalog = ProductCatalog.from_data(self.data)
+
         # Инициализация склада
         self.warehouse = WarehouseAgent(0, self, self.data["склад"]["inventory"])
 
-        # Инициализация магазинов
+        # Реестры агентов по unique_id и по имени
         self.stores = []
+        self.stores_by_id = {}
+        self.stores_by_name = {}
+        self.vehicles = []
+        self.vehicles_by_id = {}
+        self.vehicles_by_name = {}
+
+        if self.vectorized:
+            self.inventory_matrix = InventoryMatrix(self.catalog)
+            self.inventory_matrix.trigger = self.reorder_trigger
+            self.inventory_matrix.reorder = self.reorder_level
+            self.stores_by_row = {}
+            self.consumption_rng = self.spawn_rng()
+
+        # Инициализация магазинов
         for store_data in self.data["stores"]:
             store = StoreAgent(
                 store_data["id"],  # unique_id
@@ -132,7 +536,7 @@ class DeliveryModel(Model):
                 store_data["product_requirements"],  # product_requirements
             )
             store.name = store_data["name"]
-            self.stores.append(store)
+            self.add_store(store)
 
             self.log_event(
                 "store_status",
@@ -143,183 +547,226 @@ class DeliveryModel(Model):
             )
 
         # Инициализация транспорта
-        self.vehicles = []
-        for vehicle_data in self.data["vehicles"]:
-            vehicle = VehicleAgent(vehicle_data["id"], self, vehicle_data["capacity"])
-            self.vehicles.append(vehicle)
+        for vehicle_data in self.get_fleet_data():
+            capacity = self.vehicle_capacity or vehicle_data["capacity"]
+            vehicle = VehicleAgent(vehicle_data["id"], self, capacity)
+            self.add_vehicle(vehicle)
 
             self.log_event(
                 "vehicle_status",
-                f"vehicle_{vehicle_data['id']}",
+                vehicle.name,
                 "Новая машина",
-                f"Готов к работе. Вместимость: {vehicle_data['capacity']}",
+                f"Готов к работе. Вместимость: {capacity}",
                 "idle",
             )
 
-    def get_time_str(self) -> str:
-        """Получение текущего времени в строковом формате"""
-        return self.current_time.strftime("%H:%M")
+    def get_fleet_data(self) -> list:
+        """Описания машин с учетом fleet_size
+
+        При уменьшении парка берутся первые машины из исходных данных, при
+        увеличении - машины исходных данных повторяются по кругу с новыми id.
+        """
+        vehicles_data = list(self.data["vehicles"])
+        if self.fleet_size is None:
+            return vehicles_data
+        if self.fleet_size > len(vehicles_data) and not vehicles_data:
+            raise ValueError("Cannot grow an empty fleet")
+
+        next_id = max((v["id"] for v in vehicles_data), default=0) + 1
+        template_count = len(vehicles_data)
+        while len(vehicles_data) < self.fleet_size:
+            template = vehicles_data[len(vehicles_data) % template_count]
+            vehicles_data.append(dict(template, id=next_id))
+            next_id += 1
+        return vehicles_data[: self.fleet_size]
+
+    def add_store(self, store: StoreAgent):
+        """Регистрация магазина в модели"""
+        if store.unique_id in self.stores_by_id or store.name in self.stores_by_name:
+            raise ValueError(f"Store {store.unique_id} ({store.name}) already exists")
+        self.stores.append(store)
+        self.stores_by_id[store.unique_id] = store
+        self.stores_by_name[store.name] = store
+        self.structure_version += 1
+        if store.inventory_row is not None:
+            self.stores_by_row[store.inventory_row] = store
+        if self.scheduler:
+            self.scheduler.add(store)
+
+    def remove_store(self, store: StoreAgent):
+        """Удаление магазина из модели"""
+        self.stores.remove(store)
+        del self.stores_by_id[store.unique_id]
+        del self.stores_by_name[store.name]
+        self.structure_version += 1
+        self.warehouse.drop_pending(store.name)
+        self.warehouse.tick_orders.pop(store, None)
+        if store.inventory_row is not None:
+            self.inventory_matrix.remove_row(store.inventory_row)
+            del self.stores_by_row[store.inventory_row]
+        if self.scheduler:
+            self.scheduler.remove(store)
+
+    def add_vehicle(self, vehicle: VehicleAgent):
+        """Регистрация машины в модели"""
+        if vehicle.unique_id in self.vehicles_by_id:
+            raise ValueError(f"Vehicle {vehicle.unique_id} already exists")
+        self.vehicles.append(vehicle)
+        self.vehicles_by_id[vehicle.unique_id] = vehicle
+        self.vehicles_by_name[vehicle.name] = vehicle
+        self.structure_version += 1
+        vehicle.fleet_index = next(self._fleet_counter)
+        self.update_idle(vehicle)
+        self.schedule_vehicle(vehicle)
+        if self.scheduler:
+            self.scheduler.add(vehicle)
+
+    def remove_vehicle(self, vehicle: VehicleAgent):
+        """Удаление машины из модели"""
+        self.vehicles.remove(vehicle)
+        del self.vehicles_by_id[vehicle.unique_id]
+        del self.vehicles_by_name[vehicle.name]
+        self.structure_version += 1
+        self.idle_vehicles.pop(vehicle, None)
+        self._due_vehicles.discard(vehicle)
+        if self.scheduler:
+            self.scheduler.remove(vehicle)
+
+    def update_idle(self, vehicle: VehicleAgent):
+        """Учет машины в списке свободных после смены состояния"""
+        if vehicle.status == "idle" and self.vehicles_by_id.get(vehicle.unique_id) is vehicle:
+            self.idle_vehicles[vehicle] = vehicle.fleet_index
+        else:
+            self.idle_vehicles.pop(vehicle, None)
+
+    def get_idle_vehicles(self) -> list:
+        """Свободные машины в порядке парка"""
+        return sorted(self.idle_vehicles, key=self.idle_vehicles.get)
+
+    def spawn_rng(self) -> RandomStream:
+        """Новый независимый поток случайных чисел (для агента или планировщика)
+
+        Потоки порождаются от seed_sequence по порядку создания агентов,
+        поэтому при одном seed каждый агент получает тот же поток.
+        """
+        return RandomStream(self.seed_sequence.spawn(1)[0])
+
+    def draw_consumption(self):
+        """Случайные числа расхода на шаг для всех магазинов одним вызовом
+
+        Матрица (магазины x (1 + товары)) для векторного режима.
+        """
+        matrix = self.inventory_matrix
+        return self.consumption_rng.random((matrix.size, 1 + len(matrix.products)))
 
-    def simulate_events(self):
-        """Симуляция различных событий в системе"""
-        print(f"\nСимуляция в {self.get_time_str()}")
+    def get_time_str(self) -> str:
+        """Получение текущего времени в строковом формате (со второго дня - с днем)"""
+        if self._time_str_minutes != self.current_time:
+            self._time_str = format_minutes(self.current_time)
+            self._time_str_minutes = self.current_time
+        return self._time_str
+
+    def get_day(self) -> int:
+        """Номер текущего дня модели (с 1)"""
+        return self.current_time // MINUTES_PER_DAY + 1
+
+    def get_week_minutes(self) -> int:
+        """Текущее время в минутах от начала недели (для календарей окон)"""
+        return self.current_time
+
+    def get_time_minutes(self) -> int:
+        """Текущее время в минутах от начала суток"""
+        return self.current_time % MINUTES_PER_DAY
+
+    def simulate_events(self, stores=None):
+        """Симуляция различных событий в системе
+
+        stores - магазины с работой на шаге (None - все магазины).
+        """
+        quiet = self.quiet
+        if not quiet:
+            print(f"\nСимуляция в {self.get_time_str()}")
+        if stores is None:
+            stores = self.stores
 
         # Сначала вызываем step() для всех магазинов
-        for store in self.stores:
+        for store in stores:
             store.step()
 
         # Проверяем и обрабатываем заказы от всех магазинов
-        for store in self.stores:
+        for store in stores:
             needed_products = store.check_inventory_and_make_order()
             if needed_products:
-                print(f"Обработка заказа от {store.name}: {needed_products}")
+                needed = self.catalog.as_dict(needed_products)
+                if not quiet:
+                    print(f"Обработка заказа от {store.name}: {needed}")
 
                 self.log_event(
                     "delivery_request",
                     store.name,
                     "Новый заказ",
-                    f"Заказано: {needed_products}",
+                    "Заказано: {}",
                     "pending",
+                    needed,
                 )
 
                 # Обрабатываем заказ через склад
                 self.warehouse.process_order(store, needed_products)
 
     def log_event(
-        self, event_type: str, agent_id: str, event_desc: str, details: str, status: str
+        self,
+        event_type: str,
+        agent_id: str,
+        event_desc: str,
+        details: str,
+        status: str,
+        *args,
     ):
-        """Логирование событий"""
-        timestamp = self.get_time_str()
+        """Логирование событий
+
+        Если заданы args, details - шаблон str.format, а текст собирается
+        только при чтении журнала (CSV, отчет), а не на каждом событии.
+        Аргументы не должны меняться после вызова (передавайте копии).
+        """
+        if args:
+            details = (details, args)
         self.delivery_log.append(
-            {
-                "timestamp": timestamp,
-                "event_type": event_type,
-                "agent_id": agent_id,
-                "event_desc": event_desc,
-                "details": details,
-                "status": status,
-            }
+            self.current_time, event_type, agent_id, event_desc, details, status
         )
+        if self.report:
+            self.report.add_event(
+                self.get_time_str(),
+                event_type,
+                agent_id,
+                event_desc,
+                format_details(details),
+                status,
+            )
+
+    def close_report(self):
+        """Завершение потокового отчета (статистика и закрытие файла)"""
+        if self.report:
+            self.report.close()
+            self.report = None
 
     # В model.py добавим новый метод:
 
     def save_formatted_log(self, filename: str):
-        """Сохранение отформатированного лога работы системы"""
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write("СИСТЕМА ДОСТАВКИ - ЛОГ РАБОТЫ\n")
-            f.write("=" * 80 + "\n\n")
-
-            # Группируем события по времени
-            events_by_time = {}
-            for event in self.delivery_log:
-                time = event["timestamp"]
-                if time not in events_by_time:
-                    events_by_time[time] = []
-                events_by_time[time].append(event)
-
-            # Выводим события в хронологическом порядке
-            for time in sorted(events_by_time.keys()):
-                f.write(f"\n🕒 ВРЕМЯ: {time}\n")
-                f.write("-" * 80 + "\n")
-
-                # Группируем события по типу
-                store_events = []
-                vehicle_events = []
-                delivery_events = []
-                other_events = []
-
-                for event in events_by_time[time]:
-                    if event["event_type"].startswith("store"):
-                        store_events.append(event)
-                    elif event["event_type"].startswith("vehicle"):
-                        vehicle_events.append(event)
-                    elif event["event_type"].startswith("delivery"):
-                        delivery_events.append(event)
-                    else:
-                        other_events.append(event)
-
-                # Выводим события магазинов
-                if store_events:
-                    f.write("\n📦 МАГАЗИНЫ:\n")
-                    for event in store_events:
-                        f.write(f"  • {event['agent_id']}: {event['event_desc']}\n")
-                        f.write(f"    {event['details']}\n")
-
-                # Выводим события транспорта
-                if vehicle_events:
-                    f.write("\n🚚 ТРАНСПОРТ:\n")
-                    for event in vehicle_events:
-                        f.write(
-                            f"  • Машина {event['agent_id']}: {event['event_desc']}\n"
-                        )
-                        f.write(f"    {event['details']}\n")
-
-                # Выводим события доставок
-                if delivery_events:
-                    f.write("\n🔄 ДОСТАВКИ:\n")
-                    for event in delivery_events:
-                        status_emoji = "✅" if event["status"] == "completed" else "⏳"
-                        f.write(f"  • {status_emoji} {event['event_desc']}\n")
-                        f.write(f"    {event['details']}\n")
-
-                # Выводим остальные события
-                if other_events:
-                    f.write("\n📝 ПРОЧИЕ СОБЫТИЯ:\n")
-                    for event in other_events:
-                        f.write(f"  • {event['event_desc']}\n")
-                        f.write(f"    {event['details']}\n")
-
-                # Выводим текущее состояние системы
-                f.write("\n📊 СОСТОЯНИЕ СИСТЕМЫ:\n")
-                # Состояние магазинов
-                for store in self.stores:
-                    f.write(f"\n  🏪 {store.name}:\n")
-                    f.write("    Запасы:\n")
-                    for product, amount in store.inventory.items():
-                        required = store.product_requirements[product]
-                        percentage = (amount / required * 100) if required > 0 else 0
-                        status = (
-                            "✅"
-                            if percentage >= 80
-                            else "⚠️" if percentage >= 30 else "❗"
-                        )
-                        f.write(f"      • {product}: {amount}/{required} {status}\n")
-
-                # Состояние транспорта
-                f.write("\n  🚛 Транспорт:\n")
-                for vehicle in self.vehicles:
-                    status_text = {
-                        "idle": "ожидает",
-                        "en_route": "в пути",
-                        "returning": "возвращается",
-                    }.get(vehicle.status, vehicle.status)
-
-                    destination = (
-                        f" к {vehicle.destination.name}" if vehicle.destination else ""
-                    )
-                    load = (
-                        f" (груз: {vehicle.current_load})"
-                        if vehicle.current_load
-                        else ""
-                    )
-
-                    f.write(
-                        f"      • Машина {vehicle.unique_id}: {status_text}{destination}{load}\n"
-                    )
-
-                f.write("\n" + "-" * 80 + "\n")
-
-            # Добавляем статистику в конец
-            f.write("\n📈 ОБЩАЯ СТАТИСТИКА\n")
-            f.write("=" * 80 + "\n")
-            total_deliveries = len(
-                [e for e in self.delivery_log if e["event_type"] == "delivery_complete"]
-            )
-            total_requests = len(
-                [e for e in self.delivery_log if e["event_type"] == "delivery_request"]
-            )
-            f.write(f"Всего заказов: {total_requests}\n")
-            f.write(f"Успешных доставок: {total_deliveries}\n")
+        """Сохранение отформатированного лога работы системы
+
+        Журнал проходится один раз в порядке записи событий (сброшенные
+        на диск, затем в памяти), в конце каждой временной метки пишется
+        текущее состояние системы. Статистика берется из счетчиков
+        журнала, поэтому учитывает и события, вытесненные из
+        ограниченного журнала.
+        """
+        log = self.delivery_log
+        writer = ReportWriter(filename, self)
+        for event in log:
+            writer.add_event(**event)
+        writer.total_requests = log.total(EventType.DELIVERY_REQUEST)
+        writer.total_deliveries = log.total(EventType.DELIVERY_COMPLETE)
+        writer.close(dropped=log.dropped)
 
     def get_formatted_state(self):
         """Получение текущего состояния системы в отформатированном виде"""
@@ -336,10 +783,7 @@ class DeliveryModel(Model):
                     for product, current in store.inventory.items()
                     for required in [store.product_requirements[product]]
                 ),
-                f"Окна доставки: "
-                + ", ".join(
-                    f"{start}:00-{end}:00" for start, end in store.delivery_windows
-                ),
+                f"Окна доставки: {store.calendar.describe()}",
             ]
             state.extend(store_info)
 
@@ -370,6 +814,12 @@ class DeliveryModel(Model):
                 f"Статус: {status_text} {destination_text}",
                 f"Загрузка: {load_info} (максимум: {vehicle.capacity})",
             ]
+            progress = vehicle.get_progress()
+            if progress is not None:
+                vehicle_info.append(
+                    f"Прогресс: {progress[0]}%, осталось {progress[1]} минут"
+                    f" (прибытие в {format_minutes(vehicle.arrival_time)})"
+                )
             state.extend(vehicle_info)
 
         return "\n".join(state)
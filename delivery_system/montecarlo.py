@@ -0,0 +1,128 @@
+# delivery_system/montecarlo.py
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+from .model import DeliveryModel
+
+KPI_NAMES = [
+    "deliveries_completed",
+    "stockout_minutes",
+    "km_driven",
+    "vehicle_utilization",
+]
+
+# Журнал событий в прогонах ограничивается последними событиями
+REPLICA_LOG_EVENTS = 1024
+
+# Данные сети, переданные в процесс-исполнитель один раз при его запуске
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def run_replica(
+    data: dict,
+    seed: int,
+    steps: int,
+    mode: str = "tick",
+    vectorized: bool = False,
+    params: Optional[dict] = None,
+) -> dict:
+    """Один прогон модели без вывода, возвращает показатели прогона
+
+    params - параметры модели (reorder_level, minutes_per_km, fleet_size,
+    vehicle_capacity, route_move_budget), см. DeliveryModel.
+    """
+    model = DeliveryModel(
+        None,
+        quiet=True,
+        vectorized=vectorized,
+        max_log_events=REPLICA_LOG_EVENTS,
+        seed=seed,
+        data=data,
+        **(params or {}),
+    )
+    model.run(steps, mode=mode)
+    kpis = model.get_kpis()
+    kpis["seed"] = seed
+    return kpis
+
+
+def _run_worker_replica(seed, steps, mode, vectorized, params=None):
+    return run_replica(_worker_data, seed, steps, mode, vectorized, params)
+
+
+def replica_seeds(seed: int, runs: int):
+    """Независимые seed для прогонов, порожденные от общего seed"""
+    return [int(s) for s in np.random.SeedSequence(seed).generate_state(runs)]
+
+
+def summarize(results) -> dict:
+    """Сводка по прогонам: среднее, стандартное отклонение, минимум и максимум"""
+    summary = {}
+    for name in KPI_NAMES:
+        values = np.array([result[name] for result in results], dtype=float)
+        summary[name] = {
+            "mean": float(values.mean()),
+            "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+            "min": float(values.min()),
+            "max": float(values.max()),
+        }
+    return summary
+
+
+def run_monte_carlo(
+    input_file: str,
+    runs: int,
+    steps: int,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    mode: str = "tick",
+    vectorized: bool = False,
+) -> dict:
+    """Параллельный прогон runs реплик модели на пуле процессов
+
+    Входной JSON читается один раз и передается исполнителям при их
+    запуске. Возвращает показатели каждого прогона, сводку и
+    производительность (прогонов в секунду).
+    """
+    if runs < 1:
+        raise ValueError("runs must be at least 1")
+    with open(input_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    workers = workers or os.cpu_count() or 1
+    seeds = replica_seeds(seed, runs)
+    started = time.perf_counter()
+
+    if workers == 1:
+        results = [run_replica(data, s, steps, mode, vectorized) for s in seeds]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(data,)
+        ) as executor:
+            results = list(
+                executor.map(
+                    _run_worker_replica,
+                    seeds,
+                    [steps] * runs,
+                    [mode] * runs,
+                    [vectorized] * runs,
+                    chunksize=max(1, runs // (workers * 4)),
+                )
+            )
+
+    elapsed = time.perf_counter() - started
+    return {
+        "runs": results,
+        "summary": summarize(results),
+        "workers": workers,
+        "elapsed": elapsed,
+        "runs_per_second": runs / elapsed if elapsed > 0 else float("inf"),
+    }
@@ -1,7 +1,14 @@
 from .server import DeliveryServer
+from .async_server import AsyncDeliveryServer
+from .clock import SimulationClock
 from .client import DeliveryClient
+from .protocol import MessageStream, ProtocolError
 
 __all__ = [
     'DeliveryServer',
+    'AsyncDeliveryServer',
+    'SimulationClock',
     'DeliveryClient',
+    'MessageStream',
+    'ProtocolError',
 ]
\ No newline at end of file
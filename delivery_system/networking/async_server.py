@@ -0,0 +1,137 @@
+# delivery_system/networking/async_server.py
+import asyncio
+import signal
+import threading
+from .protocol import FrameDecoder, ProtocolError, RECV_BUFFER_SIZE
+from .clock import DEFAULT_STEP_INTERVAL
+from .server import DeliveryServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Длина очереди входящих подключений
+DEFAULT_BACKLOG = 4096
+
+
+def raise_open_file_limit():
+    """Поднимает мягкий лимит открытых файлов до жесткого
+
+    Каждое подключение - это открытый дескриптор; лимита по умолчанию
+    (часто 1024) не хватает для тысяч клиентов. Возвращает новый лимит
+    (None, если лимит задать нельзя).
+    """
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+class AsyncDeliveryServer(DeliveryServer):
+    """Сервер на asyncio: все подключения обслуживает один цикл событий
+
+    Чтение и запись кадров идут в цикле событий, а модель шагает в потоке
+    часов (SimulationClock). Ответы собираются из готового снимка модели
+    (см. respond) без ожидания шага, поэтому медленный шаг не
+    задерживает клиентов, а медленные клиенты не задерживают шаг.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 5001,
+        step_interval: float = DEFAULT_STEP_INTERVAL,
+        backlog: int = DEFAULT_BACKLOG,
+    ):
+        self.host = host
+        self.port = port
+        self.step_interval = step_interval
+        self.backlog = backlog
+        self.model = None
+        self.clock = None
+        # Все соединения меняются только в цикле событий, блокировка не нужна
+        self.clients = set()
+        self._running = True
+        self._server = None
+        self._loop = None
+        self._stopped = None
+
+    def shutdown(self, signum=None, frame=None):
+        """Остановка сервера (можно вызывать из любого потока)"""
+        self._running = False
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def start(self):
+        """Запуск сервера (блокирует до остановки)"""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_clock()
+            print("Сервер остановлен")
+
+    async def serve(self):
+        """Прием подключений до вызова shutdown()"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._install_signal_handlers()
+
+        # Часы (и первый снимок модели) - до приема подключений
+        self.start_clock()
+        self._server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port, backlog=self.backlog
+        )
+        print(f"\nОжидание подключений на {self.host}:{self.port} (asyncio)...")
+        async with self._server:
+            await self._stopped.wait()
+            print("\nПолучен сигнал завершения работы...")
+            print("Закрываем все соединения...")
+            self._server.close()
+            for writer in list(self.clients):
+                writer.close()
+            await self._server.wait_closed()
+
+    def _install_signal_handlers(self):
+        # Сигналы доставляются только главному потоку; сервер, запущенный
+        # в другом потоке, останавливают через shutdown()
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(signum, self.shutdown)
+            except NotImplementedError:
+                # Windows: обработчик вызывается в главном потоке
+                signal.signal(signum, self.shutdown)
+
+    async def handle_connection(self, reader, writer):
+        """Обработка одного подключения
+
+        Все запросы, пришедшие одним пакетом, обрабатываются по очереди,
+        а ответы на них отправляются вместе, с одним ожиданием drain().
+        """
+        decoder = FrameDecoder()
+        self.clients.add(writer)
+        try:
+            while self._running:
+                data = await reader.read(RECV_BUFFER_SIZE)
+                if not data:
+                    break
+                for message in decoder.feed(data):
+                    writer.write(self.respond(message))
+                await writer.drain()
+        except (ConnectionError, ProtocolError) as e:
+            if self._running:
+                address = writer.get_extra_info("peername")
+                print(f"Ошибка при обработке клиента {address}: {e}")
+        finally:
+            self.clients.discard(writer)
+            writer.close()
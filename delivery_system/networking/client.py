@@ -1,36 +1,54 @@
 import socket
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from .protocol import MessageStream
 
 class DeliveryClient:
     def __init__(self, host: str = 'localhost', port: int = 5000):
         self.host = host
         self.port = port
         self.sock = None
+        self.stream = None
         
     def connect(self):
         """Подключение к серверу"""
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.sock.connect((self.host, self.port))
+        self.stream = MessageStream(self.sock)
         
     def disconnect(self):
         """Отключение от сервера"""
         if self.sock:
             self.sock.close()
             self.sock = None
+            self.stream = None
             
     def send_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Отправка сообщения серверу"""
+        return self.send_messages([message])[0]
+        
+    def send_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Отправка нескольких сообщений подряд (конвейером)
+        
+        Все запросы отправляются сразу, затем читаются ответы в том же
+        порядке - одно ожидание сети на весь пакет запросов.
+        """
         if not self.sock:
             raise ConnectionError("Not connected to server")
             
         try:
-            # Отправляем сообщение
-            self.sock.send(json.dumps(message).encode())
+            for message in messages:
+                self.stream.send(message)
             
-            # Получаем ответ
-            response = self.sock.recv(4096)
-            return json.loads(response.decode())
+            responses = []
+            for _ in messages:
+                response = self.stream.receive()
+                if response is None:
+                    raise ConnectionError("Server closed the connection")
+                responses.append(response)
+            return responses
+        except ConnectionError:
+            raise
         except Exception as e:
             raise ConnectionError(f"Error communicating with server: {e}")
             
@@ -48,4 +66,48 @@ class DeliveryClient:
             'type': 'get_vehicle_status',
             'vehicle_id': vehicle_id
         }
+        return self.send_message(message)
+        
+    def get_all_stores(self, ids: Optional[List[int]] = None,
+                       fields: Optional[List[str]] = None,
+                       offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Статусы многих магазинов одним запросом
+        
+        ids - номера магазинов (по умолчанию все), fields - нужные поля
+        (по умолчанию все), offset и limit - страница списка.
+        """
+        message = {
+            'type': 'get_all_stores',
+            'ids': ids,
+            'fields': fields,
+            'offset': offset,
+            'limit': limit
+        }
+        return self.send_message(message)
+        
+    def get_all_vehicles(self, ids: Optional[List[int]] = None,
+                         fields: Optional[List[str]] = None,
+                         offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Статусы многих машин одним запросом (параметры как у get_all_stores)"""
+        message = {
+            'type': 'get_all_vehicles',
+            'ids': ids,
+            'fields': fields,
+            'offset': offset,
+            'limit': limit
+        }
+        return self.send_message(message)
+        
+    def get_network_state(self, store_ids: Optional[List[int]] = None,
+                          vehicle_ids: Optional[List[int]] = None,
+                          store_fields: Optional[List[str]] = None,
+                          vehicle_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Время, магазины, машины и склад одним запросом (все данные - с одного шага)"""
+        message = {
+            'type': 'get_network_state',
+            'store_ids': store_ids,
+            'vehicle_ids': vehicle_ids,
+            'store_fields': store_fields,
+            'vehicle_fields': vehicle_fields
+        }
         return self.send_message(message)
\ No newline at end of file
@@ -0,0 +1,76 @@
+# delivery_system/networking/clock.py
+import threading
+import time
+import traceback
+
+# Секунд реального времени на шаг модели по умолчанию (шаг - 15 минут модели)
+DEFAULT_STEP_INTERVAL = 4.0
+
+
+class SimulationClock:
+    """Поток, который шагает модель в собственном темпе
+
+    Модель идет шаг за шагом каждые step_interval секунд (0 - так быстро,
+    как возможно) независимо от того, сколько клиентов подключено и как
+    часто они спрашивают статус. Шаг выполняется под lock: код, который
+    меняет модель из другого потока (например, добавляет магазин), берет
+    тот же lock. Читателям lock не нужен - они читают model.snapshot.
+
+    Если шаг модели завершился исключением, часы останавливаются, ошибка
+    выводится в консоль и сохраняется в error (сервер отдает ее клиентам).
+    """
+
+    def __init__(self, model, step_interval: float = DEFAULT_STEP_INTERVAL, lock=None):
+        if step_interval < 0:
+            raise ValueError("step_interval must be non-negative")
+        self.model = model
+        self.step_interval = step_interval
+        self.lock = lock if lock is not None else threading.Lock()
+        self.steps = 0
+        self.error = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запуск потока часов"""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._run, name="simulation-clock", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Остановка после текущего шага"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopped.is_set()
+
+    def _run(self):
+        next_step = time.perf_counter()
+        while not self._stopped.is_set():
+            try:
+                with self.lock:
+                    self.model.step()
+            except Exception as e:
+                print(f"Ошибка на шаге модели {self.steps + 1}, часы остановлены:")
+                traceback.print_exc()
+                self.error = e
+                self._stopped.set()
+                return
+            self.steps += 1
+
+            if self.step_interval:
+                # Интервал отсчитывается от начала шага, чтобы долгие шаги
+                # не замедляли часы; пропущенные шаги не догоняются
+                next_step = max(
+                    next_step + self.step_interval, time.perf_counter()
+                )
+                self._stopped.wait(next_step - time.perf_counter())
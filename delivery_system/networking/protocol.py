@@ -0,0 +1,106 @@
+# delivery_system/networking/protocol.py
+import json
+import struct
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Кадр: длина тела (4 байта, big-endian) + тело - JSON в UTF-8
+HEADER = struct.Struct("!I")
+
+# Наибольший допустимый размер тела кадра
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Размер буфера чтения из сокета
+RECV_BUFFER_SIZE = 64 * 1024
+
+
+class ProtocolError(Exception):
+    """Нарушение формата кадров"""
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """Кадр для готового тела (например, заранее сериализованного JSON)"""
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {len(payload)} bytes")
+    return HEADER.pack(len(payload)) + payload
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """Сообщение -> кадр"""
+    return encode_frame(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+class FrameDecoder:
+    """Инкрементальный разбор потока байтов на кадры
+
+    Данные добавляются по мере поступления (feed); кадр может прийти
+    по частям, а несколько кадров - одним пакетом (конвейерные запросы).
+    """
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+        self._start = 0
+
+    def feed(self, data) -> list:
+        """Добавление данных, возвращает список полностью принятых сообщений"""
+        self._buffer += data
+        messages = []
+        buffer = self._buffer
+        while len(buffer) - self._start >= HEADER.size:
+            (size,) = HEADER.unpack_from(buffer, self._start)
+            if size > self.max_frame_size:
+                raise ProtocolError(f"Frame too large: {size} bytes")
+            end = self._start + HEADER.size + size
+            if len(buffer) < end:
+                break
+            payload = bytes(buffer[self._start + HEADER.size : end])
+            self._start = end
+            try:
+                messages.append(json.loads(payload.decode("utf-8")))
+            except ValueError as e:
+                raise ProtocolError(f"Invalid message: {e}") from e
+
+        # Разобранные кадры удаляются из буфера одним сдвигом
+        if self._start:
+            del buffer[: self._start]
+            self._start = 0
+        return messages
+
+    def pending_bytes(self) -> int:
+        """Сколько байтов недополученного кадра лежит в буфере"""
+        return len(self._buffer) - self._start
+
+
+class MessageStream:
+    """Обмен сообщениями через сокет кадрами протокола
+
+    На соединение создается один объект: буфер чтения и декодер
+    переиспользуются между сообщениями, запись идет через sendall.
+    """
+
+    def __init__(self, sock, buffer_size: int = RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.decoder = FrameDecoder()
+        self._read_buffer = bytearray(buffer_size)
+        self._read_view = memoryview(self._read_buffer)
+        self._received = deque()
+
+    def send(self, message: Dict[str, Any]):
+        """Отправка сообщения"""
+        self.sock.sendall(encode_message(message))
+
+    def send_frame(self, frame: bytes):
+        """Отправка готового кадра (см. encode_frame)"""
+        self.sock.sendall(frame)
+
+    def receive(self) -> Optional[Dict[str, Any]]:
+        """Следующее сообщение (None - соединение закрыто)"""
+        while not self._received:
+            count = self.sock.recv_into(self._read_buffer)
+            if not count:
+                if self.decoder.pending_bytes():
+                    raise ProtocolError("Connection closed in the middle of a frame")
+                return None
+            self._received.extend(self.decoder.feed(self._read_view[:count]))
+        return self._received.popleft()
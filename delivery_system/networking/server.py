@@ -1,33 +1,111 @@
 # delivery_system/networking/server.py
-import socket
 import json
+import socket
 import threading
 from typing import Dict, Any
 import signal
+from .protocol import HEADER, MessageStream, encode_frame, encode_message
+from .clock import DEFAULT_STEP_INTERVAL, SimulationClock
+from ..snapshot import STORE_FIELDS, VEHICLE_FIELDS, encode_json
+
+# Начало успешного ответа; data - готовый JSON из снимка модели
+SUCCESS_PREFIX = b'{"status": "success", "data": '
+
+
+def success_frame(data: bytes) -> bytes:
+    """Кадр успешного ответа с уже сериализованным data"""
+    return encode_frame(b"".join((SUCCESS_PREFIX, data, b"}")))
+
+
+def error_frame(text: str) -> bytes:
+    """Кадр ответа с ошибкой"""
+    return encode_message({"status": "error", "message": text})
+
+
+def select_ids(blobs, ids, kind: str):
+    """Номера агентов для пакетного запроса: (найденные, не найденные)
+
+    ids=None - все агенты снимка в порядке модели.
+    """
+    if ids is None:
+        return list(blobs), []
+    if not isinstance(ids, list):
+        raise ValueError(f"{kind} must be a list")
+    found = []
+    missing = []
+    for agent_id in ids:
+        if isinstance(agent_id, int) and agent_id in blobs:
+            found.append(agent_id)
+        else:
+            missing.append(agent_id)
+    return found, missing
+
+
+def select_page(ids: list, offset, limit) -> list:
+    """Страница списка номеров: offset - сколько пропустить, limit - сколько взять"""
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("offset must be a non-negative integer")
+    if limit is None:
+        return ids[offset:]
+    if not isinstance(limit, int) or limit < 0:
+        raise ValueError("limit must be a non-negative integer")
+    return ids[offset : offset + limit]
+
+
+def encode_items(blobs, states, ids: list, fields, id_field: str, known: tuple) -> bytes:
+    """JSON-массив статусов агентов ids
+
+    Без fields склеиваются готовые JSON из снимка; с fields каждый статус
+    сокращается до выбранных полей (номер агента остается всегда).
+    """
+    if fields is None:
+        return b"[" + b", ".join(blobs[agent_id] for agent_id in ids) + b"]"
+    if not isinstance(fields, list):
+        raise ValueError("fields must be a list")
+    unknown = [field for field in fields if field not in known]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}")
+    selected = [id_field] + [field for field in fields if field != id_field]
+    return encode_json(
+        [{field: states[agent_id][field] for field in selected} for agent_id in ids]
+    )
 
 
 class DeliveryServer:
-    def __init__(self, host: str = "0.0.0.0", port: int = 5001):
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 5001,
+        step_interval: float = DEFAULT_STEP_INTERVAL,
+    ):
         self.host = host
         self.port = port
+        self.step_interval = step_interval
+        self.clock = None
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.clients = []
+        # Список клиентов меняют потоки соединений и поток accept
+        self._clients_lock = threading.Lock()
         self.model = None
         self._running = True
 
-        # Обработчик сигнала прерывания
-        signal.signal(signal.SIGINT, self.shutdown)
-        signal.signal(signal.SIGTERM, self.shutdown)
+        # Обработчик сигнала прерывания (задать можно только в главном потоке)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.shutdown)
+            signal.signal(signal.SIGTERM, self.shutdown)
 
     def shutdown(self, signum, frame):
         """Корректное завершение работы сервера"""
         print("\nПолучен сигнал завершения работы...")
         self._running = False
+        self.stop_clock()
 
         # Закрываем все клиентские соединения
         print("Закрываем все соединения...")
-        for client in self.clients:
+        with self._clients_lock:
+            clients = list(self.clients)
+        for client in clients:
             try:
                 client.close()
             except:
@@ -42,11 +120,30 @@ class DeliveryServer:
 
         print("Сервер остановлен")
 
+    def start_clock(self):
+        """Запуск часов модели (см. SimulationClock)
+
+        Модель публикует снимок состояния после каждого шага, запросы
+        клиентов читают только его. Вызывается до приема подключений,
+        чтобы первый снимок был готов к первому запросу.
+        """
+        if self.clock is None and self.model is not None:
+            self.model.enable_snapshots()
+            self.clock = SimulationClock(self.model, self.step_interval)
+            self.clock.start()
+
+    def stop_clock(self):
+        """Остановка часов модели"""
+        if self.clock is not None:
+            self.clock.stop()
+            self.clock = None
+
     def start(self):
         """Запуск сервера"""
         try:
             self.sock.bind((self.host, self.port))
             self.sock.listen(5)
+            self.start_clock()
 
             hostname = socket.gethostname()
             addresses = socket.getaddrinfo(hostname, None)
@@ -62,10 +159,12 @@ class DeliveryServer:
                     self.sock.settimeout(1.0)
                     try:
                         client, address = self.sock.accept()
+                        with self._clients_lock:
+                            self.clients.append(client)
+                            count = len(self.clients)
                         print(f"\nНовое подключение с {address}")
-                        print(f"Всего активных подключений: {len(self.clients) + 1}")
+                        print(f"Всего активных подключений: {count}")
 
-                        self.clients.append(client)
                         client_thread = threading.Thread(
                             target=self.handle_client, args=(client, address)
                         )
@@ -84,97 +183,182 @@ class DeliveryServer:
             self.shutdown(None, None)
 
     def handle_client(self, client: socket.socket, address: tuple):
-        """Обработка клиентских подключений"""
+        """Обработка клиентских подключений
+
+        Запросы и ответы передаются кадрами (см. protocol.py); несколько
+        запросов, пришедших одним пакетом, обрабатываются по очереди.
+        """
+        stream = MessageStream(client)
         try:
             while self._running:
-                data = client.recv(4096)
-                if not data:
+                message = stream.receive()
+                if message is None:
                     break
 
-                message = json.loads(data.decode())
-                response = self.process_message(message)
-                client.send(json.dumps(response).encode())
+                stream.send_frame(self.respond(message))
         except Exception as e:
             print(f"Ошибка при обработке клиента {address}: {e}")
         finally:
             client.close()
-            if client in self.clients:
-                self.clients.remove(client)
+            with self._clients_lock:
+                if client in self.clients:
+                    self.clients.remove(client)
             print(f"Клиент отключен: {address}")
 
-    # В server.py обновим метод process_message
     def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
-        """Обработка сообщений от клиентов"""
+        """Обработка сообщений от клиентов (ответ в виде словаря)"""
+        return json.loads(self.respond(message)[HEADER.size :])
+
+    def respond(self, message: Dict[str, Any]) -> bytes:
+        """Ответ на сообщение в виде готового кадра
+
+        Модель шагает в собственном потоке (SimulationClock), запросы
+        только читают последний опубликованный снимок (model.snapshot):
+        ссылка на снимок берется один раз, поэтому ответ целиком
+        относится к одному шагу, а JSON статусов собран при публикации
+        снимка и общий для всех клиентов.
+        """
         try:
             if not self.model:
-                return {"status": "error", "message": "Model not initialized"}
+                return error_frame("Model not initialized")
+
+            clock = self.clock
+            if clock is not None and clock.error is not None:
+                return error_frame(f"Simulation stopped: {clock.error!r}")
+
+            # Снимки включаются в start_clock() до приема подключений;
+            # потоки запросов модель не меняют
+            snapshot = self.model.snapshot
+            if snapshot is None:
+                return error_frame("Simulation not started")
 
             msg_type = message.get("type")
 
             # Добавляем новый тип сообщения для получения времени симуляции
             if msg_type == "get_simulation_time":
-                return {
-                    "status": "success",
-                    "data": {"time": self.model.get_time_str()},
-                }
-
-            # Выполняем шаг симуляции только при запросах статуса
-            elif msg_type in ["get_store_status", "get_vehicle_status"]:
-                self.model.step()
-
-                if msg_type == "get_store_status":
-                    store_id = message.get("store_id")
-                    store = next(
-                        (s for s in self.model.stores if s.unique_id == store_id), None
+                return success_frame(snapshot.time_json)
+
+            elif msg_type == "get_store_status":
+                store_id = message.get("store_id")
+                data = snapshot.stores.get(store_id)
+                if data is None:
+                    return error_frame(f"Store {store_id} not found")
+                return success_frame(data)
+
+            elif msg_type == "get_vehicle_status":
+                vehicle_id = message.get("vehicle_id")
+                data = snapshot.vehicles.get(vehicle_id)
+                if data is None:
+                    return error_frame(f"Vehicle {vehicle_id} not found")
+                return success_frame(data)
+
+            elif msg_type == "get_all_stores":
+                return success_frame(
+                    self.encode_batch(
+                        snapshot,
+                        message,
+                        snapshot.stores,
+                        snapshot.store_states,
+                        "store_id",
+                        STORE_FIELDS,
                     )
-                    if store:
-                        return {
-                            "status": "success",
-                            "data": {
-                                "store_id": store_id,
-                                "inventory": store.inventory,
-                                "requirements": store.product_requirements,
-                                "delivery_windows": store.delivery_windows,
-                                "name": store.name,
-                            },
-                        }
-                    else:
-                        return {
-                            "status": "error",
-                            "message": f"Store {store_id} not found",
-                        }
-
-                elif msg_type == "get_vehicle_status":
-                    vehicle_id = message.get("vehicle_id")
-                    vehicle = next(
-                        (v for v in self.model.vehicles if v.unique_id == vehicle_id),
-                        None,
+                )
+
+            elif msg_type == "get_all_vehicles":
+                return success_frame(
+                    self.encode_batch(
+                        snapshot,
+                        message,
+                        snapshot.vehicles,
+                        snapshot.vehicle_states,
+                        "vehicle_id",
+                        VEHICLE_FIELDS,
                     )
-                    if vehicle:
-                        return {
-                            "status": "success",
-                            "data": {
-                                "vehicle_id": vehicle_id,
-                                "status": vehicle.status,
-                                "current_load": vehicle.current_load,
-                                "capacity": vehicle.capacity,
-                                "destination": (
-                                    vehicle.destination.name
-                                    if vehicle.destination
-                                    else None
-                                ),
-                            },
-                        }
-                    else:
-                        return {
-                            "status": "error",
-                            "message": f"Vehicle {vehicle_id} not found",
-                        }
+                )
+
+            elif msg_type == "get_network_state":
+                return success_frame(self.encode_network(snapshot, message))
+
             else:
-                return {
-                    "status": "error",
-                    "message": f"Unknown message type: {msg_type}",
-                }
+                return error_frame(f"Unknown message type: {msg_type}")
 
+        except ValueError as e:
+            return error_frame(str(e))
         except Exception as e:
-            return {"status": "error", "message": f"Error processing message: {str(e)}"}
+            return error_frame(f"Error processing message: {str(e)}")
+
+    def encode_batch(self, snapshot, message, blobs, states, id_field, known) -> bytes:
+        """Данные ответа get_all_stores / get_all_vehicles
+
+        Параметры сообщения: ids - список номеров (по умолчанию все),
+        fields - список полей (по умолчанию все), offset и limit - страница.
+        total - сколько агентов найдено до разбиения на страницы, missing -
+        номера из ids, которых нет в модели.
+        """
+        ids, missing = select_ids(blobs, message.get("ids"), "ids")
+        page = select_page(ids, message.get("offset", 0), message.get("limit"))
+        items = encode_items(
+            blobs, states, page, message.get("fields"), id_field, known
+        )
+        return b"".join(
+            (
+                b'{"time": ',
+                encode_json(snapshot.time),
+                b', "total": ',
+                encode_json(len(ids)),
+                b', "offset": ',
+                encode_json(message.get("offset", 0)),
+                b', "missing": ',
+                encode_json(missing),
+                b', "items": ',
+                items,
+                b"}",
+            )
+        )
+
+    def encode_network(self, snapshot, message) -> bytes:
+        """Данные ответа get_network_state
+
+        Без параметров - готовое состояние сети из снимка. store_ids и
+        vehicle_ids ограничивают списки магазинов и машин, store_fields и
+        vehicle_fields - их поля; missing - номера, которых нет в модели.
+        """
+        options = ("store_ids", "vehicle_ids", "store_fields", "vehicle_fields")
+        if all(message.get(option) is None for option in options):
+            return snapshot.network
+
+        store_ids, missing_stores = select_ids(
+            snapshot.stores, message.get("store_ids"), "store_ids"
+        )
+        vehicle_ids, missing_vehicles = select_ids(
+            snapshot.vehicles, message.get("vehicle_ids"), "vehicle_ids"
+        )
+        return b"".join(
+            (
+                b'{"time": ',
+                encode_json(snapshot.time),
+                b', "stores": ',
+                encode_items(
+                    snapshot.stores,
+                    snapshot.store_states,
+                    store_ids,
+                    message.get("store_fields"),
+                    "store_id",
+                    STORE_FIELDS,
+                ),
+                b', "vehicles": ',
+                encode_items(
+                    snapshot.vehicles,
+                    snapshot.vehicle_states,
+                    vehicle_ids,
+                    message.get("vehicle_fields"),
+                    "vehicle_id",
+                    VEHICLE_FIELDS,
+                ),
+                b', "warehouse": ',
+                snapshot.warehouse,
+                b', "missing": ',
+                encode_json({"stores": missing_stores, "vehicles": missing_vehicles}),
+                b"}",
+            )
+        )
@@ -0,0 +1,116 @@
+# delivery_system/pending.py
+import heapq
+import itertools
+import math
+
+
+class PendingStoreIndex:
+    """Очередь отложенных магазинов склада с приоритетом
+
+    Приоритет - (наибольшая потребность, наименьшее расстояние от склада).
+    Записи не удаляются из кучи при изменении заказа: у каждого магазина
+    есть номер версии, и устаревшие записи отбрасываются при извлечении.
+    Магазин, в который сейчас нельзя выехать (машина приедет вне окна
+    доставки), откладывается во вторую кучу до минуты модельного времени,
+    в которую окно откроется (шаги не идут подряд: ночью время
+    перескакивает к утру, поэтому номер шага для этого не годится).
+    Календарь выезда (календарь прибытия, сдвинутый на время в пути)
+    строится для магазина один раз.
+    """
+
+    def __init__(self, model, depot: str = "склад"):
+        self.model = model
+        self.depot = depot
+        # (-потребность, расстояние, номер записи, имя магазина, версия)
+        self._ready = []
+        # (минута пробуждения, порядковый номер, запись из _ready)
+        self._parked = []
+        self._versions = {}
+        self._departures = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._versions)
+
+    def update(self, store, needed_products):
+        """Добавление магазина или изменение его заказа (вектор количеств)"""
+        # Номер версии уникален, поэтому старая запись не станет снова
+        # действительной после удаления и повторного добавления магазина
+        version = next(self._counter)
+        self._versions[store.name] = version
+        distance = self.model.scheduler.get_distance(self.depot, store.name)
+        entry = (-sum(needed_products), distance, version, store.name, version)
+        heapq.heappush(self._ready, entry)
+
+    def discard(self, store_name: str):
+        """Удаление магазина (его записи в кучах становятся устаревшими)"""
+        self._versions.pop(store_name, None)
+
+    def peek(self):
+        """Магазин с наибольшим приоритетом, в который можно выехать сейчас"""
+        self._wake()
+        while self._ready:
+            entry = self._ready[0]
+            store_name, version = entry[3], entry[4]
+            store = self.model.stores_by_name.get(store_name)
+            if self._versions.get(store_name) != version or store is None:
+                heapq.heappop(self._ready)
+                continue
+            if store.awaiting_vehicle:
+                # Магазин ждет машину: запись вернется через update()
+                heapq.heappop(self._ready)
+                del self._versions[store_name]
+                continue
+            delay = self.minutes_until_open(store)
+            if delay == math.inf:
+                # У магазина нет окон доставки - выехать к нему нельзя никогда
+                heapq.heappop(self._ready)
+                del self._versions[store_name]
+                continue
+            if delay:
+                heapq.heappop(self._ready)
+                wake_minute = self.model.current_time + delay
+                heapq.heappush(
+                    self._parked, (wake_minute, next(self._counter), entry)
+                )
+                continue
+            return store
+        return None
+
+    def pop(self):
+        """Извлечение магазина с наибольшим приоритетом (или None)"""
+        store = self.peek()
+        if store is not None:
+            heapq.heappop(self._ready)
+            del self._versions[store.name]
+        return store
+
+    def _wake(self):
+        """Возврат в очередь магазинов, у которых открылось окно выезда"""
+        now = self.model.current_time
+        while self._parked and self._parked[0][0] <= now:
+            _, _, entry = heapq.heappop(self._parked)
+            if self._versions.get(entry[3]) == entry[4]:
+                heapq.heappush(self._ready, entry)
+
+    def departure_calendar(self, store):
+        """Календарь выезда со склада, при котором машина прибудет в окно
+
+        Это календарь прибытия магазина (окна доставки, открытые на 15 минут
+        раньше, как в will_store_be_available), сдвинутый на время в пути.
+        """
+        calendar = self._departures.get(store.name)
+        if calendar is None:
+            distance = self.model.scheduler.get_distance(self.depot, store.name)
+            travel = distance * self.model.minutes_per_km
+            calendar = store.arrival_calendar.shifted(-travel)
+            self._departures[store.name] = calendar
+        return calendar
+
+    def minutes_until_open(self, store) -> float:
+        """Через сколько минут можно выехать в магазин (0 - можно сейчас)"""
+        now = self.model.get_week_minutes()
+        opening = self.departure_calendar(store).next_opening(now)
+        if opening is None:
+            return math.inf
+        return opening - now
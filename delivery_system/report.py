@@ -0,0 +1,151 @@
+# delivery_system/report.py
+
+# Размер буфера файла отчета
+REPORT_BUFFER_SIZE = 1 << 16
+
+STATUS_NAMES = {
+    "idle": "ожидает",
+    "en_route": "в пути",
+    "returning": "возвращается",
+}
+
+
+class ReportWriter:
+    """Потоковая запись отформатированного лога работы системы
+
+    События поступают по порядку времени. В памяти хранятся только события
+    текущей временной метки: при смене метки (или по end_step) блок
+    записывается в файл вместе с состоянием системы. Статистика считается
+    счетчиками по ходу записи.
+    """
+
+    def __init__(self, filename: str, model):
+        self.model = model
+        self.file = open(filename, "w", encoding="utf-8", buffering=REPORT_BUFFER_SIZE)
+        self.file.write("СИСТЕМА ДОСТАВКИ - ЛОГ РАБОТЫ\n")
+        self.file.write("=" * 80 + "\n\n")
+
+        self.current_time = None
+        self._reset_groups()
+        self.total_requests = 0
+        self.total_deliveries = 0
+
+    def _reset_groups(self):
+        self.store_events = []
+        self.vehicle_events = []
+        self.delivery_events = []
+        self.other_events = []
+
+    def add_event(
+        self,
+        timestamp: str,
+        event_type: str,
+        agent_id: str,
+        event_desc: str,
+        details: str,
+        status: str,
+    ):
+        """Добавление события в отчет"""
+        if timestamp != self.current_time:
+            self.end_step()
+            self.current_time = timestamp
+
+        event = (agent_id, event_desc, details, status)
+        if event_type.startswith("store"):
+            self.store_events.append(event)
+        elif event_type.startswith("vehicle"):
+            self.vehicle_events.append(event)
+        elif event_type.startswith("delivery"):
+            self.delivery_events.append(event)
+            if event_type == "delivery_complete":
+                self.total_deliveries += 1
+            elif event_type == "delivery_request":
+                self.total_requests += 1
+        else:
+            self.other_events.append(event)
+
+    def end_step(self):
+        """Запись накопленных событий текущей временной метки"""
+        if self.current_time is None:
+            return
+
+        f = self.file
+        f.write(f"\n🕒 ВРЕМЯ: {self.current_time}\n")
+        f.write("-" * 80 + "\n")
+
+        # Выводим события магазинов
+        if self.store_events:
+            f.write("\n📦 МАГАЗИНЫ:\n")
+            for agent_id, event_desc, details, _ in self.store_events:
+                f.write(f"  • {agent_id}: {event_desc}\n")
+                f.write(f"    {details}\n")
+
+        # Выводим события транспорта
+        if self.vehicle_events:
+            f.write("\n🚚 ТРАНСПОРТ:\n")
+            for agent_id, event_desc, details, _ in self.vehicle_events:
+                f.write(f"  • Машина {agent_id}: {event_desc}\n")
+                f.write(f"    {details}\n")
+
+        # Выводим события доставок
+        if self.delivery_events:
+            f.write("\n🔄 ДОСТАВКИ:\n")
+            for _, event_desc, details, status in self.delivery_events:
+                status_emoji = "✅" if status == "completed" else "⏳"
+                f.write(f"  • {status_emoji} {event_desc}\n")
+                f.write(f"    {details}\n")
+
+        # Выводим остальные события
+        if self.other_events:
+            f.write("\n📝 ПРОЧИЕ СОБЫТИЯ:\n")
+            for _, event_desc, details, _ in self.other_events:
+                f.write(f"  • {event_desc}\n")
+                f.write(f"    {details}\n")
+
+        self.write_state()
+        f.write("\n" + "-" * 80 + "\n")
+
+        self.current_time = None
+        self._reset_groups()
+
+    def write_state(self):
+        """Запись текущего состояния системы"""
+        f = self.file
+        f.write("\n📊 СОСТОЯНИЕ СИСТЕМЫ:\n")
+        # Состояние магазинов
+        for store in self.model.stores:
+            f.write(f"\n  🏪 {store.name}:\n")
+            f.write("    Запасы:\n")
+            for product, amount in store.inventory.items():
+                required = store.product_requirements[product]
+                percentage = (amount / required * 100) if required > 0 else 0
+                status = "✅" if percentage >= 80 else "⚠️" if percentage >= 30 else "❗"
+                f.write(f"      • {product}: {amount}/{required} {status}\n")
+
+        # Состояние транспорта
+        f.write("\n  🚛 Транспорт:\n")
+        for vehicle in self.model.vehicles:
+            status_text = STATUS_NAMES.get(vehicle.status, vehicle.status)
+            destination = f" к {vehicle.destination.name}" if vehicle.destination else ""
+            load = f" (груз: {vehicle.current_load})" if vehicle.current_load else ""
+            f.write(
+                f"      • Машина {vehicle.unique_id}: {status_text}{destination}{load}\n"
+            )
+
+    def close(self, dropped: int = 0):
+        """Запись статистики и закрытие файла
+
+        dropped - сколько событий не попало в отчет (вытеснены из
+        ограниченного журнала); в статистике они учтены.
+        """
+        if self.file.closed:
+            return
+        self.end_step()
+        f = self.file
+        f.write("\n📈 ОБЩАЯ СТАТИСТИКА\n")
+        f.write("=" * 80 + "\n")
+        if dropped:
+            f.write(f"Ранних событий нет в отчете (журнал ограничен): {dropped}\n")
+        f.write(f"Всего заказов: {self.total_requests}\n")
+        f.write(f"Успешных доставок: {self.total_deliveries}\n")
+        f.close()
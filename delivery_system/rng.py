@@ -0,0 +1,55 @@
+# delivery_system/rng.py
+from array import array
+import numpy as np
+
+# Сколько чисел выбирается за один вызов генератора для одиночных запросов
+DEFAULT_BLOCK_SIZE = 256
+
+
+class RandomStream:
+    """Независимый поток случайных чисел агента
+
+    Обертка над numpy.random.Generator. Одиночные числа выдаются из
+    заранее выбранного блока, поэтому random() обходится почти так же
+    дешево, как модуль random, а последовательность полностью задается
+    SeedSequence, из которой создан поток.
+
+    Генератор создается при первом запросе, а блок хранится в array('d'):
+    у агентов, которые не тянут числа (магазины в векторном режиме),
+    поток почти не занимает памяти.
+    """
+
+    __slots__ = ("seed_sequence", "block_size", "_generator", "_buffer", "_position")
+
+    def __init__(self, seed_sequence, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.seed_sequence = seed_sequence
+        self.block_size = block_size
+        self._generator = None
+        self._buffer = None
+        self._position = 0
+
+    @property
+    def generator(self):
+        if self._generator is None:
+            self._generator = np.random.default_rng(self.seed_sequence)
+        return self._generator
+
+    def random(self, size=None):
+        """Число из [0, 1) или массив чисел формы size"""
+        if size is not None:
+            return self.generator.random(size)
+        buffer = self._buffer
+        if buffer is None or self._position == len(buffer):
+            buffer = self._buffer = array("d", self.generator.random(self.block_size))
+            self._position = 0
+        value = buffer[self._position]
+        self._position += 1
+        return value
+
+    def shuffle(self, items):
+        """Перемешивание списка на месте"""
+        self.generator.shuffle(items)
+
+    def permutation(self, n: int):
+        """Случайная перестановка range(n) (те же числа, что и shuffle)"""
+        return self.generator.permutation(n)
@@ -0,0 +1,319 @@
+# delivery_system/routing.py
+import time
+from typing import Optional
+import numpy as np
+
+# Сколько ходов локального поиска (проверок 2-opt и вариантов вставки
+# or-opt) допускается за один вызов plan(). Граница по числу ходов, а не
+# по времени: результат не зависит от скорости и загрузки машины
+DEFAULT_MOVE_BUDGET = 10_000
+
+# Сколько ближайших по сбережению соседей рассматривается для каждого магазина
+SAVINGS_NEIGHBOURS = 16
+
+# Изменения длины меньше EPSILON не считаются улучшением
+EPSILON = 1e-9
+
+# Стоимость единицы груза, не поместившейся в машину, в единицах
+# неиспользованной вместимости (см. assign_vehicles)
+SHORTAGE_COST = 100
+
+
+def assign_vehicles(loads, capacities):
+    """Назначение машин маршрутам: жадный алгоритм с сожалением
+
+    loads - вес груза маршрутов, capacities - вместимости свободных машин.
+    Стоимость назначения - не поместившийся груз (с весом SHORTAGE_COST)
+    плюс пустое место в машине. На каждом шаге выбирается маршрут с
+    наибольшим сожалением - разницей стоимостей второй и лучшей по
+    вместимости машины, - и получает лучшую машину. Машины одинаковой
+    вместимости взаимозаменяемы, поэтому перебираются классы вместимости.
+    Возвращает список (индекс маршрута, индекс машины); маршруты, которым
+    не хватило машин, в него не попадают.
+    """
+    by_capacity = {}
+    for index, capacity in enumerate(capacities):
+        by_capacity.setdefault(capacity, []).append(index)
+
+    def cost(load, capacity):
+        return max(0, load - capacity) * SHORTAGE_COST + max(0, capacity - load)
+
+    unassigned = set(range(len(loads)))
+    assignment = []
+    while unassigned and by_capacity:
+        choice = None
+        for route in unassigned:
+            costs = sorted(
+                (cost(loads[route], capacity), capacity) for capacity in by_capacity
+            )
+            regret = costs[1][0] - costs[0][0] if len(costs) > 1 else float("inf")
+            key = (regret, loads[route], -route)
+            if choice is None or key > choice[0]:
+                choice = (key, route, costs[0][1])
+
+        _, route, capacity = choice
+        vehicles = by_capacity[capacity]
+        assignment.append((route, vehicles.pop(0)))
+        if not vehicles:
+            del by_capacity[capacity]
+        unassigned.remove(route)
+    return assignment
+
+
+class RoutePlanner:
+    """Планирование развозных маршрутов (CVRP с окнами доставки)
+
+    Маршрут начинается и заканчивается на складе и объезжает несколько
+    магазинов. Построение - метод сбережений Кларка-Райта, где для каждого
+    магазина рассматриваются только SAVINGS_NEIGHBOURS лучших пар, затем
+    локальный поиск: 2-opt внутри маршрута и перенос отрезков из 1-3
+    магазинов (or-opt) внутри маршрута и между маршрутами. Локальный поиск
+    ограничен move_budget ходами на вызов, поэтому время планирования
+    не растет неограниченно с числом магазинов, а прогоны с одним seed
+    повторяются точно. time_budget (секунды) - дополнительная граница по
+    времени для интерактивной работы; с ней маршруты зависят от скорости
+    машины, поэтому по умолчанию она выключена.
+
+    Прибытие в магазин проверяется по календарю прибытия магазина
+    (окна доставки, открытые на 15 минут раньше, как в
+    will_store_be_available), ожидание у закрытого магазина не планируется.
+    """
+
+    def __init__(
+        self,
+        model,
+        move_budget: int = DEFAULT_MOVE_BUDGET,
+        time_budget: Optional[float] = None,
+        neighbours: int = SAVINGS_NEIGHBOURS,
+    ):
+        self.model = model
+        self.move_budget = move_budget
+        self.time_budget = time_budget
+        self.neighbours = neighbours
+        # Матрица расстояний планировщика; доступ к элементам - через
+        # memoryview (возвращает float без копирования матрицы в списки)
+        self._matrix = None
+
+    def plan(self, stops, capacity, depot: str = "склад"):
+        """Маршруты для списка остановок
+
+        stops - список (узел, вес груза, календарь прибытия DeliveryCalendar),
+        capacity - наибольшая вместимость свободной машины.
+        Возвращает список маршрутов (списков индексов stops), начиная
+        с самого загруженного. Остановки, которые нельзя посетить в окно
+        доставки, в маршруты не попадают.
+        """
+        if not stops:
+            return []
+        self._moves = 0
+        self._deadline = (
+            time.perf_counter() + self.time_budget
+            if self.time_budget is not None
+            else None
+        )
+
+        scheduler = self.model.scheduler
+        self._matrix = memoryview(scheduler.distance_matrix)
+        # Остановка i маршрута - узел графа self._nodes[i], 0 - склад
+        indices = [scheduler.node_index[depot]] + [
+            scheduler.node_index[node] for node, _, _ in stops
+        ]
+        self._nodes = indices
+        self._minutes_per_km = self.model.minutes_per_km
+        self._start = self.model.get_week_minutes()
+        self._loads = [0] + [load for _, load, _ in stops]
+        self._calendars = [None] + [calendar for _, _, calendar in stops]
+        self._capacity = capacity
+
+        # Остановки 1..n; остановки вне окон доставки не планируются
+        customers = [c for c in range(1, len(indices)) if self._feasible([c])]
+        routes = self._savings(customers, scheduler.distance_matrix)
+        routes = self._improve(routes)
+
+        routes.sort(key=lambda route: (-self._route_load(route), route[0]))
+        return [[c - 1 for c in route] for route in routes]
+
+    def _distance(self, a, b) -> float:
+        return self._matrix[self._nodes[a], self._nodes[b]]
+
+    def _route_load(self, route):
+        return sum(self._loads[c] for c in route)
+
+    def _feasible(self, route) -> bool:
+        """Все прибытия маршрута попадают в окна доставки"""
+        matrix, nodes, calendars = self._matrix, self._nodes, self._calendars
+        minutes_per_km = self._minutes_per_km
+        minutes = self._start
+        previous = nodes[0]
+        for customer in route:
+            node = nodes[customer]
+            minutes += matrix[previous, node] * minutes_per_km
+            if not calendars[customer].is_open(minutes):
+                return False
+            previous = node
+        return True
+
+    def _savings(self, customers, matrix):
+        """Построение маршрутов методом сбережений (matrix - матрица планировщика)"""
+        routes = {c: [c] for c in customers}
+        route_of = {c: c for c in customers}
+        loads = {c: self._loads[c] for c in customers}
+        if len(customers) < 2:
+            return list(routes.values())
+
+        # Сбережение от объединения i и j: d(0,i) + d(0,j) - d(i,j)
+        ids = np.array([self._nodes[c] for c in customers])
+        depot = matrix[self._nodes[0], ids]
+        savings = depot[:, None] + depot[None, :] - matrix[np.ix_(ids, ids)]
+        np.fill_diagonal(savings, -np.inf)
+        k = min(self.neighbours, len(customers) - 1)
+        best = np.argpartition(-savings, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(savings, best, axis=1)
+
+        pairs = {}
+        for row, (columns, row_values) in enumerate(zip(best.tolist(), values.tolist())):
+            for column, value in zip(columns, row_values):
+                if value > EPSILON:
+                    i, j = customers[row], customers[column]
+                    pairs[(i, j) if i < j else (j, i)] = value
+        ordered = sorted(pairs.items(), key=lambda item: (-item[1], item[0]))
+
+        for (i, j), _ in ordered:
+            first, second = route_of[i], route_of[j]
+            if first == second or loads[first] + loads[second] > self._capacity:
+                continue
+            a, b = routes[first], routes[second]
+            merged = None
+            for candidate in (
+                a + b if a[-1] == i and b[0] == j else None,
+                b + a if b[-1] == j and a[0] == i else None,
+                a + b[::-1] if a[-1] == i and b[-1] == j else None,
+                a[::-1] + b if a[0] == i and b[0] == j else None,
+            ):
+                if candidate is not None and self._feasible(candidate):
+                    merged = candidate
+                    break
+            if merged is None:
+                continue
+
+            routes[first] = merged
+            loads[first] += loads[second]
+            del routes[second], loads[second]
+            for c in b:
+                route_of[c] = first
+
+        return list(routes.values())
+
+    def _expired(self) -> bool:
+        if self._moves >= self.move_budget:
+            return True
+        return self._deadline is not None and time.perf_counter() >= self._deadline
+
+    def _improve(self, routes):
+        """Локальный поиск до отсутствия улучшений или конца бюджета времени"""
+        improved = True
+        while improved and not self._expired():
+            improved = False
+            for index, route in enumerate(routes):
+                if self._two_opt(routes, index):
+                    improved = True
+            if self._or_opt(routes):
+                improved = True
+                routes = [route for route in routes if route]
+        return routes
+
+    def _two_opt(self, routes, index) -> bool:
+        """Разворот отрезка маршрута, если это сокращает путь"""
+        route = routes[index]
+        distance = self._distance
+        improved = False
+        n = len(route)
+        for i in range(n - 1):
+            if self._expired():
+                break
+            self._moves += n - i - 1
+            a = route[i - 1] if i > 0 else 0
+            for j in range(i + 1, n):
+                b, c = route[i], route[j]
+                e = route[j + 1] if j + 1 < n else 0
+                delta = (
+                    distance(a, c) + distance(b, e) - distance(a, b) - distance(c, e)
+                )
+                if delta < -EPSILON:
+                    candidate = route[:i] + route[i : j + 1][::-1] + route[j + 1 :]
+                    if self._feasible(candidate):
+                        route = candidate
+                        improved = True
+        routes[index] = route
+        return improved
+
+    def _or_opt(self, routes) -> bool:
+        """Перенос отрезка из 1-3 остановок в лучшее место любого маршрута"""
+        distance = self._distance
+        improved = False
+        for source_index in range(len(routes)):
+            for length in (1, 2, 3):
+                source = routes[source_index]
+                start = 0
+                while start + length <= len(source):
+                    if self._expired():
+                        return improved
+                    segment = source[start : start + length]
+                    before = source[start - 1] if start > 0 else 0
+                    after = source[start + length] if start + length < len(source) else 0
+                    removal_gain = (
+                        distance(before, segment[0])
+                        + distance(segment[-1], after)
+                        - distance(before, after)
+                    )
+                    rest = source[:start] + source[start + length :]
+                    if not self._feasible(rest):
+                        start += 1
+                        continue
+
+                    move = self._best_insertion(
+                        routes, source_index, rest, segment, removal_gain
+                    )
+                    if move is None:
+                        start += 1
+                        continue
+                    target_index, candidate = move
+                    if target_index == source_index:
+                        routes[source_index] = candidate
+                    else:
+                        routes[source_index] = rest
+                        routes[target_index] = candidate
+                    source = routes[source_index]
+                    improved = True
+                    if not source:
+                        break
+        return improved
+
+    def _best_insertion(self, routes, source_index, rest, segment, removal_gain):
+        """Лучшая вставка отрезка (в прямом или обратном порядке)"""
+        distance = self._distance
+        load = self._route_load(segment)
+        best_delta = -EPSILON
+        best = None
+        for target_index, target in enumerate(routes):
+            if target_index == source_index:
+                target = rest
+            elif not target or self._route_load(target) + load > self._capacity:
+                continue
+            self._moves += len(target) + 1
+            for position in range(len(target) + 1):
+                before = target[position - 1] if position > 0 else 0
+                after = target[position] if position < len(target) else 0
+                for piece in (segment, segment[::-1]):
+                    delta = (
+                        distance(before, piece[0])
+                        + distance(piece[-1], after)
+                        - distance(before, after)
+                        - removal_gain
+                    )
+                    if delta < best_delta:
+                        candidate = target[:position] + piece + target[position:]
+                        if self._feasible(candidate):
+                            best_delta = delta
+                            best = (target_index, candidate)
+        return best
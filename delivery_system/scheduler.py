@@ -1,34 +1,96 @@
 import networkx as nx
-from datetime import datetime, timedelta
-import random
+import numpy as np
 import csv
+from .delivery_calendar import MINUTES_PER_DAY
+from .event_log import format_minutes
 
 
 class DeliveryScheduler:
     def __init__(self, model):
         self.model = model
+        self.rng = model.spawn_rng()
         self.schedule = []
-        self.route_graph = nx.Graph()
         self._agents = {}
-        self._build_graph()
+        # Кеш для step(): ключи агентов, их позиции и номера агентов,
+        # которые работают на каждом шаге (сбрасывается при add/remove)
+        self._keys = None
+        self._build_distance_matrix(self.model.data["distances"])
         self._add_all_agents()
 
-    def _build_graph(self):
-        """Создание графа маршрутов с использованием матрицы расстояний"""
-        # Добавляем склад
-        self.route_graph.add_node("склад")
-
-        # Добавляем магазины
-        for store in self.model.stores:
-            self.route_graph.add_node(
-                store.name, delivery_windows=store.delivery_windows
-            )
-
-        # Добавляем рёбра с реальными расстояниями из матрицы
-        distances = self.model.data["distances"]
+    def _build_distance_matrix(self, distances: dict):
+        """Расчет матриц кратчайших расстояний и предшественников между всеми узлами
+
+        Дороги из исходных данных (distances) двусторонние. Матрицы строятся
+        сразу по ним алгоритмом Флойда - Уоршелла: на каждом шаге k все
+        пути разом пробуются через узел k операциями numpy. Расстояния
+        считаются один раз при создании планировщика, после чего любой
+        запрос расстояния или маршрута - это чтение из массива.
+        """
+        # Узлы: склад, магазины, затем прочие узлы из таблицы расстояний
+        self.nodes = ["склад"] + [store.name for store in self.model.stores]
+        self.node_index = {node: index for index, node in enumerate(self.nodes)}
+        edges = []
         for from_node, to_nodes in distances.items():
             for to_node, distance in to_nodes.items():
-                self.route_graph.add_edge(from_node, to_node, weight=distance)
+                for node in (from_node, to_node):
+                    if node not in self.node_index:
+                        self.node_index[node] = len(self.nodes)
+                        self.nodes.append(node)
+                edges.append(
+                    (self.node_index[from_node], self.node_index[to_node], distance)
+                )
+        size = len(self.nodes)
+
+        # distance_matrix[i, j] - длина кратчайшего пути из i в j
+        # predecessor_matrix[i, j] - предыдущий узел на этом пути (-1 - нет пути)
+        dist = np.full((size, size), np.inf)
+        predecessors = np.full((size, size), -1, dtype=np.int32)
+        if edges:
+            source, target, weight = (np.array(column) for column in zip(*edges))
+            # Оба направления каждой дороги подряд: при повторе дороги
+            # действует последнее расстояние
+            rows = np.column_stack((source, target)).ravel()
+            columns = np.column_stack((target, source)).ravel()
+            dist[rows, columns] = np.repeat(weight, 2)
+            predecessors[rows, columns] = rows
+        diagonal = np.arange(size)
+        dist[diagonal, diagonal] = 0
+        predecessors[diagonal, diagonal] = -1
+
+        for k in range(size):
+            through = dist[:, k, None] + dist[None, k, :]
+            shorter = through < dist
+            np.copyto(dist, through, where=shorter)
+            np.copyto(
+                predecessors,
+                np.broadcast_to(predecessors[k], (size, size)),
+                where=shorter,
+            )
+
+        self.distance_matrix = dist
+        self.predecessor_matrix = predecessors
+
+    def get_distance(self, from_node: str, to_node: str):
+        """Кратчайшее расстояние между двумя узлами"""
+        distance = self.distance_matrix[
+            self.node_index[from_node], self.node_index[to_node]
+        ]
+        # Целые километры из матрицы расстояний остаются целыми
+        return int(distance) if distance.is_integer() else float(distance)
+
+    def get_route(self, from_node: str, to_node: str):
+        """Кратчайший маршрут между двумя узлами в виде списка узлов"""
+        source_index = self.node_index[from_node]
+        current = self.node_index[to_node]
+        if source_index != current and self.predecessor_matrix[source_index, current] < 0:
+            raise nx.NetworkXNoPath(f"No path between {from_node} and {to_node}")
+
+        route = [self.nodes[current]]
+        while current != source_index:
+            current = self.predecessor_matrix[source_index, current]
+            route.append(self.nodes[current])
+        route.reverse()
+        return route
 
     def _add_all_agents(self):
         """Добавление всех агентов в планировщик"""
@@ -46,58 +108,106 @@ class DeliveryScheduler:
     def add(self, agent):
         """Добавление агента в планировщик"""
         self._agents[agent.unique_id] = agent
-
-    def step(self):
-        """Выполняем один шаг для всех агентов в случайном порядке."""
-        agent_keys = list(self._agents.keys())
-        random.shuffle(agent_keys)
-        for agent_key in agent_keys:
-            self._agents[agent_key].step()
+        self._keys = None
+
+    def remove(self, agent):
+        """Удаление агента из планировщика"""
+        if self._agents.get(agent.unique_id) is agent:
+            del self._agents[agent.unique_id]
+            self._keys = None
+
+    def _index_agents(self):
+        self._keys = list(self._agents.keys())
+        self._positions = {key: index for index, key in enumerate(self._keys)}
+        self._every_tick = np.array(
+            [
+                index
+                for index, key in enumerate(self._keys)
+                if not getattr(self._agents[key], "event_driven", False)
+            ],
+            dtype=np.int64,
+        )
+
+    def step(self, due=None, idle=None):
+        """Выполняем один шаг для агентов в случайном порядке.
+
+        due - агенты с событиями на этом шаге. Если due задан, агенты с
+        event_driven = True (машины) вызываются, только если они есть в due,
+        и на шаге перебираются только активные агенты. idle - агенты из
+        работающих на каждом шаге, которым на этом шаге нечего делать (они
+        пропускаются). Порядок перемешивается всегда целиком, чтобы
+        последовательность случайных чисел не зависела от того, какие
+        агенты активны.
+        """
+        if due is None:
+            agent_keys = list(self._agents.keys())
+            self.rng.shuffle(agent_keys)
+            for agent_key in agent_keys:
+                self._agents[agent_key].step()
+            return
+
+        if self._keys is None:
+            self._index_agents()
+        # permutation(n) дает тот же порядок, что и shuffle списка из n ключей
+        order = self.rng.permutation(len(self._keys))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+
+        active = self._every_tick
+        if idle:
+            idle_indices = [
+                self._positions[agent.unique_id]
+                for agent in idle
+                if self._agents.get(agent.unique_id) is agent
+            ]
+            active = np.setdiff1d(active, idle_indices, assume_unique=True)
+        due_indices = [
+            self._positions[agent.unique_id]
+            for agent in due
+            if self._agents.get(agent.unique_id) is agent
+        ]
+        if due_indices:
+            active = np.concatenate((active, due_indices))
+        keys = self._keys
+        for index in active[np.argsort(rank[active])].tolist():
+            self._agents[keys[index]].step()
 
     def generate_schedule(self):
         """Генерация расписания доставок"""
-        current_time = datetime.strptime("09:00", "%H:%M")
+        # Минуты от 00:00 первого дня (понедельника)
+        current_time = 9 * 60
 
         # Для каждого магазина
         for store in self.model.stores:
             # Находим кратчайший путь от склада до магазина
-            path = nx.shortest_path(
-                self.route_graph, "склад", store.name, weight="weight"
-            )
-            distance = nx.shortest_path_length(
-                self.route_graph, "склад", store.name, weight="weight"
-            )
+            path = self.get_route("склад", store.name)
+            distance = self.get_distance("склад", store.name)
 
             # Оцениваем общий вес груза
             total_weight = sum(store.product_requirements.values())
 
             # Оцениваем время доставки (15 минут на единицу расстояния)
-            delivery_time = timedelta(minutes=15 * distance)
-
-            # Находим подходящее окно доставки
-            for window_start, window_end in store.delivery_windows:
-                window_start_time = datetime.strptime(f"{window_start}:00", "%H:%M")
-                window_end_time = datetime.strptime(f"{window_end}:00", "%H:%M")
-
-                if current_time + delivery_time <= window_end_time:
-                    # Добавляем доставку в расписание
-                    delivery_slot = {
-                        "store_id": store.name,
-                        "departure_time": current_time.strftime("%H:%M"),
-                        "arrival_time": (current_time + delivery_time).strftime(
-                            "%H:%M"
-                        ),
-                        "products": store.product_requirements,
-                        "distance": distance,
-                        "route": " -> ".join(path),
-                    }
-                    self.schedule.append(delivery_slot)
-
-                    # Обновляем текущее время
-                    current_time += delivery_time + timedelta(
-                        minutes=30
-                    )  # 30 минут на разгрузку
-                    break
+            delivery_time = 15 * distance
+
+            # Находим подходящее окно доставки: окно того же дня,
+            # которое закрывается не раньше прибытия
+            arrival = current_time + delivery_time
+            closing = store.calendar.next_closing(arrival)
+            day_end = (arrival // MINUTES_PER_DAY + 1) * MINUTES_PER_DAY
+            if closing is not None and closing <= day_end:
+                # Добавляем доставку в расписание
+                delivery_slot = {
+                    "store_id": store.name,
+                    "departure_time": format_minutes(current_time),
+                    "arrival_time": format_minutes(current_time + delivery_time),
+                    "products": store.product_requirements,
+                    "distance": distance,
+                    "route": " -> ".join(path),
+                }
+                self.schedule.append(delivery_slot)
+
+                # Обновляем текущее время
+                current_time += delivery_time + 30  # 30 минут на разгрузку
 
     def save_schedule(self, filename: str):
         """Метод теперь только выводит информацию в консоль"""
@@ -0,0 +1,220 @@
+# delivery_system/sinks.py
+import bisect
+import json
+import queue
+import threading
+from .agents import StoreAgent, VehicleAgent
+
+# Размер буфера, при заполнении которого данные сбрасываются на диск
+DEFAULT_FLUSH_BYTES = 1 << 16
+
+
+class LogSink:
+    """Приемник снимков состояния модели (вызывается из write_to_log)"""
+
+    def write_state(self, model):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileLogSink(LogSink):
+    """Запись снимков состояния в текстовый файл
+
+    Файл открывается один раз и пишется через буфер размером flush_bytes.
+    every - записывать каждый N-й шаг, on_change - пропускать шаги, на
+    которых состояние не изменилось. background=True переносит запись на
+    диск в отдельный поток, чтобы шаг симуляции не ждал диск.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        every: int = 1,
+        on_change: bool = False,
+        background: bool = False,
+    ):
+        self.path = path
+        self.every = every
+        self.on_change = on_change
+        self._ticks = 0
+        self._last_state = None
+
+        self.file = open(path, "w", encoding="utf-8", buffering=flush_bytes)
+        self.file.write("СИСТЕМА ДОСТАВКИ - ЛОГ РАБОТЫ\n")
+        self.file.write("=" * 80 + "\n\n")
+
+        self._queue = None
+        self._thread = None
+        self._error = None
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._writer, daemon=True)
+            self._thread.start()
+
+    def _writer(self):
+        """Фоновый поток записи"""
+        while True:
+            text = self._queue.get()
+            if text is None:
+                break
+            try:
+                self.file.write(text)
+            except Exception as e:
+                self._error = e
+                break
+
+    def write_state(self, model):
+        """Запись состояния модели на текущем шаге"""
+        self._ticks += 1
+        if (self._ticks - 1) % self.every:
+            return
+
+        state = model.format_state()
+        if self.on_change:
+            if state == self._last_state:
+                return
+            self._last_state = state
+
+        text = (
+            f"\n🕒 ВРЕМЯ: {model.get_time_str()}\n"
+            + "-" * 80
+            + "\n"
+            + state
+            + "\n\n"
+            + "=" * 80
+            + "\n"
+        )
+        if self._queue is not None:
+            if self._error:
+                raise self._error
+            self._queue.put(text)
+        else:
+            self.file.write(text)
+
+    def flush(self):
+        """Принудительный сброс буфера на диск (для синхронного режима)"""
+        if self._queue is None:
+            self.file.flush()
+
+    def close(self):
+        """Дописать оставшиеся данные и закрыть файл"""
+        if self.file.closed:
+            return
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+        self.file.close()
+        if self._error:
+            raise self._error
+
+
+class DeltaSnapshotSink(LogSink):
+    """Запись снимков состояния в виде изменений (JSON Lines)
+
+    Каждые keyframe_every шагов (и при изменении состава сети) пишется
+    полный снимок, на остальных шагах - только состояния агентов,
+    изменившихся с прошлого шага (model.dirty_agents). Файл читается
+    классом SnapshotReader.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        keyframe_every: int = 96,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+    ):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self._last_keyframe = None
+        self._structure_version = None
+        self.file = open(path, "w", encoding="utf-8", buffering=flush_bytes)
+
+    def write_state(self, model):
+        """Запись снимка или изменений на текущем шаге"""
+        tick = model.ticks
+        keyframe = (
+            self._last_keyframe is None
+            or tick - self._last_keyframe >= self.keyframe_every
+            or model.structure_version != self._structure_version
+        )
+
+        if keyframe:
+            record = {"tick": tick, "time": model.get_time_str(), "type": "keyframe"}
+            record.update(model.get_network_state())
+            self._last_keyframe = tick
+            self._structure_version = model.structure_version
+        else:
+            if not model.dirty_agents:
+                return
+            record = {"tick": tick, "time": model.get_time_str(), "type": "delta"}
+            for agent in model.dirty_agents:
+                state = model.get_agent_state(agent)
+                if isinstance(agent, VehicleAgent):
+                    record.setdefault("vehicles", {})[str(agent.unique_id)] = state
+                elif isinstance(agent, StoreAgent):
+                    record.setdefault("stores", {})[agent.name] = state
+                else:
+                    record["warehouse"] = state
+
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class SnapshotReader:
+    """Восстановление состояния сети на любом шаге из файла DeltaSnapshotSink"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # (шаг, признак полного снимка, смещение строки в файле)
+        self.index = []
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                record = json.loads(line)
+                self.index.append(
+                    (record["tick"], record["type"] == "keyframe", offset)
+                )
+                offset += len(line)
+
+    def ticks(self):
+        """Шаги, для которых в файле есть записи"""
+        return [tick for tick, _, _ in self.index]
+
+    def state_at(self, tick: int) -> dict:
+        """Состояние сети на шаге tick (последний снимок + изменения)"""
+        position = bisect.bisect_right([entry[0] for entry in self.index], tick)
+        if position == 0:
+            raise ValueError(f"No snapshot at or before tick {tick}")
+
+        start = position - 1
+        while not self.index[start][1]:
+            start -= 1
+            if start < 0:
+                raise ValueError(f"No keyframe at or before tick {tick}")
+
+        with open(self.path, "rb") as f:
+            f.seek(self.index[start][2])
+            state = None
+            for _ in range(position - start):
+                record = json.loads(f.readline())
+                if state is None:
+                    state = {
+                        "time": record["time"],
+                        "stores": record["stores"],
+                        "vehicles": record["vehicles"],
+                        "warehouse": record["warehouse"],
+                    }
+                    continue
+                state["time"] = record["time"]
+                state["stores"].update(record.get("stores", {}))
+                state["vehicles"].update(record.get("vehicles", {}))
+                if "warehouse" in record:
+                    state["warehouse"] = record["warehouse"]
+        state["tick"] = tick
+        return state
@@ -0,0 +1,165 @@
+# delivery_system/snapshot.py
+import json
+from types import MappingProxyType
+
+
+def encode_json(value) -> bytes:
+    """Значение -> JSON в UTF-8 (как в протоколе сервера)"""
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+# Поля статусов магазина и машины (для выборки полей в запросах)
+STORE_FIELDS = (
+    "store_id",
+    "inventory",
+    "requirements",
+    "delivery_windows",
+    "windows_text",
+    "name",
+)
+VEHICLE_FIELDS = (
+    "vehicle_id",
+    "status",
+    "current_load",
+    "capacity",
+    "destination",
+    "progress",
+    "remaining_minutes",
+)
+
+
+def store_status(store) -> dict:
+    """Статус магазина для клиентов"""
+    return {
+        "store_id": store.unique_id,
+        "inventory": dict(store.inventory),
+        "requirements": dict(store.product_requirements),
+        "delivery_windows": store.delivery_windows,
+        # Окна текстом ("9:00-12:00" или по дням недели) для вывода клиентом
+        "windows_text": store.calendar.describe(),
+        "name": store.name,
+    }
+
+
+def vehicle_status(vehicle) -> dict:
+    """Статус машины для клиентов (ход рейса считается на момент вызова)"""
+    progress = vehicle.get_progress()
+    return {
+        "vehicle_id": vehicle.unique_id,
+        "status": vehicle.status,
+        "current_load": vehicle.current_load,
+        "capacity": vehicle.capacity,
+        "destination": vehicle.destination.name if vehicle.destination else None,
+        "progress": progress[0] if progress else None,
+        "remaining_minutes": progress[1] if progress else None,
+    }
+
+
+class ModelSnapshot:
+    """Неизменяемое состояние модели после шага
+
+    Все данные уже сериализованы в JSON (bytes): статус каждого магазина
+    и машины, время и состояние всей сети. Снимок создается один раз за
+    шаг и без изменений отдается всем читателям из любых потоков.
+    Словари статусов (store_states, vehicle_states) нужны для выборки
+    отдельных полей и только читаются.
+    """
+
+    __slots__ = (
+        "tick",
+        "time",
+        "time_json",
+        "stores",
+        "vehicles",
+        "store_states",
+        "vehicle_states",
+        "warehouse",
+        "network",
+    )
+
+    def __init__(self, tick, time, stores, vehicles, warehouse):
+        self.tick = tick
+        self.time = time
+        self.time_json = encode_json({"time": time})
+        # unique_id -> JSON статуса, в порядке model.stores / model.vehicles
+        self.stores = MappingProxyType({key: blob for key, (_, blob) in stores.items()})
+        self.vehicles = MappingProxyType(
+            {key: blob for key, (_, blob) in vehicles.items()}
+        )
+        self.store_states = MappingProxyType(
+            {key: state for key, (state, _) in stores.items()}
+        )
+        self.vehicle_states = MappingProxyType(
+            {key: state for key, (state, _) in vehicles.items()}
+        )
+        self.warehouse = warehouse
+        # {"time": ..., "stores": [...], "vehicles": [...], "warehouse": {...}}
+        self.network = b"".join(
+            (
+                b'{"time": ',
+                encode_json(time),
+                b', "stores": [',
+                b", ".join(self.stores.values()),
+                b'], "vehicles": [',
+                b", ".join(self.vehicles.values()),
+                b'], "warehouse": ',
+                warehouse,
+                b"}",
+            )
+        )
+
+
+class SnapshotPublisher:
+    """Сборка снимков модели после каждого шага
+
+    JSON агента кешируется и пересобирается, только если агент изменился
+    на шаге (model.dirty_agents) или если это машина в рейсе - ее ход
+    зависит от времени. Состояние сети склеивается из готовых JSON
+    агентов без повторной сериализации.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._stores = {}
+        self._vehicles = {}
+
+    def publish(self, full: bool = False) -> ModelSnapshot:
+        """Снимок текущего состояния (full=True - пересобрать всех агентов)"""
+        model = self.model
+        dirty = model.dirty_agents
+
+        # Кеш агента - пара (словарь статуса, JSON статуса)
+        cached = self._stores
+        stores = {}
+        for store in model.stores:
+            entry = None if full or store in dirty else cached.get(store)
+            if entry is None:
+                state = store_status(store)
+                entry = (state, encode_json(state))
+            stores[store] = entry
+
+        cached = self._vehicles
+        vehicles = {}
+        for vehicle in model.vehicles:
+            entry = cached.get(vehicle)
+            if (
+                entry is None
+                or full
+                or vehicle in dirty
+                or vehicle.arrival_time is not None
+            ):
+                state = vehicle_status(vehicle)
+                entry = (state, encode_json(state))
+            vehicles[vehicle] = entry
+
+        # Кеш хранит только агентов, которые есть в модели сейчас
+        self._stores = stores
+        self._vehicles = vehicles
+
+        return ModelSnapshot(
+            model.ticks,
+            model.get_time_str(),
+            {store.unique_id: entry for store, entry in stores.items()},
+            {vehicle.unique_id: entry for vehicle, entry in vehicles.items()},
+            encode_json(model.get_agent_state(model.warehouse)),
+        )
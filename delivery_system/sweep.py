@@ -0,0 +1,223 @@
+# delivery_system/sweep.py
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+import numpy as np
+from .routing import DEFAULT_MOVE_BUDGET
+from .montecarlo import (
+    KPI_NAMES,
+    _init_worker,
+    _run_worker_replica,
+    replica_seeds,
+    run_replica,
+    summarize,
+)
+
+# Параметры модели, которые можно перебирать (см. DeliveryModel).
+# reorder_trigger не перебирается: simulate_events на каждом шаге заказывает
+# все товары ниже reorder_level, поэтому порог reorder_trigger на
+# результаты не влияет. route_time_budget не перебирается: прогоны с seed
+# ограничивают поиск маршрутов только числом ходов (route_move_budget).
+SWEEP_PARAMS = {
+    "reorder_level": float,
+    "minutes_per_km": float,
+    "fleet_size": int,
+    "vehicle_capacity": int,
+    "route_move_budget": int,
+}
+
+DEFAULT_CACHE_DIR = "data/sweep_cache"
+
+# Версия модели для кеша: увеличивать при изменениях, которые меняют
+# результаты прогонов, чтобы старые результаты не переиспользовались
+MODEL_VERSION = 2
+
+
+def _check_params(names):
+    unknown = set(names) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+
+
+def grid(space: dict) -> list:
+    """Все сочетания значений: {"fleet_size": [2, 3], ...} -> список точек"""
+    _check_params(space)
+    names = list(space)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(space[name] for name in names))
+    ]
+
+
+def random_points(space: dict, count: int, seed: int = 0) -> list:
+    """Случайные точки: значение - список вариантов или диапазон (min, max)"""
+    _check_params(space)
+    rng = np.random.default_rng(seed)
+    points = []
+    for _ in range(count):
+        point = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if SWEEP_PARAMS[name] is int:
+                    point[name] = int(rng.integers(low, high + 1))
+                else:
+                    point[name] = float(rng.uniform(low, high))
+            else:
+                point[name] = values[int(rng.integers(len(values)))]
+        points.append(point)
+    return points
+
+
+def data_digest(data: dict) -> str:
+    """Хеш исходных данных: кеш не переиспользуется для другой сети"""
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(
+    digest: str, params: dict, seed: int, steps: int, mode: str, vectorized: bool
+) -> str:
+    """Ключ прогона в кеше: хеш данных, параметров, seed и версии модели"""
+    text = json.dumps(
+        {
+            "version": MODEL_VERSION,
+            "data": digest,
+            "params": params,
+            "route_move_budget": params.get("route_move_budget", DEFAULT_MOVE_BUDGET),
+            "seed": seed,
+            "steps": steps,
+            "mode": mode,
+            "vectorized": vectorized,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Результаты прогонов на диске, по одному JSON-файлу на прогон
+
+    Файл записывается сразу после завершения прогона (через временный файл
+    и os.replace), поэтому прерванный перебор при повторном запуске
+    продолжается с места остановки.
+    """
+
+    def __init__(self, directory: Optional[str]):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, result: dict):
+        if not self.directory:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(temp_path, path)
+
+
+def run_sweep(
+    input_file: str,
+    points: list,
+    runs: int,
+    steps: int,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    mode: str = "tick",
+    vectorized: bool = False,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+) -> dict:
+    """Перебор точек параметров, runs прогонов в каждой точке
+
+    Во всех точках используются одни и те же seed прогонов, поэтому
+    различия между точками вызваны параметрами, а не случайностью.
+    Прогоны, уже лежащие в кеше, не пересчитываются.
+    """
+    if runs < 1:
+        raise ValueError("runs must be at least 1")
+    with open(input_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    for point in points:
+        _check_params(point)
+
+    workers = workers or os.cpu_count() or 1
+    seeds = replica_seeds(seed, runs)
+    digest = data_digest(data)
+    cache = ResultCache(cache_dir)
+    started = time.perf_counter()
+
+    # Результаты по (номер точки, номер прогона); недостающие считаются
+    results = {}
+    pending = []
+    for point_index, point in enumerate(points):
+        for run_index, run_seed in enumerate(seeds):
+            key = cache_key(digest, point, run_seed, steps, mode, vectorized)
+            cached = cache.get(key)
+            if cached is not None:
+                results[point_index, run_index] = cached
+            else:
+                pending.append((point_index, run_index, run_seed, key))
+    cached_runs = len(results)
+
+    if workers == 1:
+        for point_index, run_index, run_seed, key in pending:
+            result = run_replica(
+                data, run_seed, steps, mode, vectorized, points[point_index]
+            )
+            cache.put(key, result)
+            results[point_index, run_index] = result
+    elif pending:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(data,)
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _run_worker_replica,
+                    run_seed,
+                    steps,
+                    mode,
+                    vectorized,
+                    points[point_index],
+                ): (point_index, run_index, key)
+                for point_index, run_index, run_seed, key in pending
+            }
+            for future in as_completed(futures):
+                point_index, run_index, key = futures[future]
+                result = future.result()
+                cache.put(key, result)
+                results[point_index, run_index] = result
+
+    elapsed = time.perf_counter() - started
+    table = []
+    for point_index, point in enumerate(points):
+        point_runs = [results[point_index, run_index] for run_index in range(runs)]
+        table.append(
+            {"params": point, "runs": point_runs, "summary": summarize(point_runs)}
+        )
+    return {
+        "points": table,
+        "kpis": KPI_NAMES,
+        "workers": workers,
+        "elapsed": elapsed,
+        "computed_runs": len(pending),
+        "cached_runs": cached_runs,
+    }
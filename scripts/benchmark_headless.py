@@ -0,0 +1,61 @@
+# scripts/benchmark_headless.py
+from delivery_system.model import DeliveryModel
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+
+def measure(input_file, steps, seed, quiet, log_file=None):
+    """Замер скорости прогона модели в шагах в секунду"""
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            model = DeliveryModel(
+                input_file, quiet=quiet, log_file=log_file, seed=seed
+            )
+            started = time.perf_counter()
+            model.run(steps)
+            model.close()
+            elapsed = time.perf_counter() - started
+    return steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Сравнение скорости обычного и тихого режимов симуляции"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default="data/input_data.json",
+        help="Файл с исходными данными (по умолчанию: data/input_data.json)",
+    )
+    parser.add_argument(
+        "--steps", type=int, default=2000, help="Количество шагов (по умолчанию: 2000)"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42, help="Зерно генератора (по умолчанию: 42)"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Обычный режим: вывод в консоль (перенаправлен) и лог на диск
+        verbose_rate = measure(
+            args.input,
+            args.steps,
+            args.seed,
+            quiet=False,
+            log_file=os.path.join(tmp_dir, "simulation_log.txt"),
+        )
+
+    quiet_rate = measure(args.input, args.steps, args.seed, quiet=True)
+
+    print(f"Шагов в прогоне: {args.steps}")
+    print(f"Обычный режим: {verbose_rate:.0f} шагов/с")
+    print(f"Тихий режим:   {quiet_rate:.0f} шагов/с")
+    print(f"Ускорение:     {quiet_rate / verbose_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
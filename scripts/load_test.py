@@ -0,0 +1,210 @@
+# scripts/load_test.py
+from delivery_system.networking.async_server import raise_open_file_limit
+from delivery_system.networking.protocol import (
+    FrameDecoder,
+    RECV_BUFFER_SIZE,
+    encode_message,
+)
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_message(args):
+    """Запрос, которым клиенты нагружают сервер"""
+    message = {"type": args.message}
+    if args.message == "get_store_status":
+        message["store_id"] = args.store_id
+    elif args.message == "get_vehicle_status":
+        message["vehicle_id"] = args.vehicle_id
+    return message
+
+
+async def run_connection(host, port, frame, deadline, latencies, stats):
+    """Одно подключение: запрос - ответ, пока не истечет время"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats["failed"] += 1
+        return
+    stats["connected"] += 1
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    decoder = FrameDecoder()
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(frame)
+            await writer.drain()
+            messages = []
+            while not messages:
+                data = await reader.read(RECV_BUFFER_SIZE)
+                if not data:
+                    raise ConnectionError("Server closed the connection")
+                messages = decoder.feed(data)
+            latencies.append(time.perf_counter() - started)
+            if messages[0].get("status") != "success":
+                stats["errors"] += 1
+    except (OSError, ConnectionError):
+        stats["dropped"] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(args):
+    frame = encode_message(build_message(args))
+    latencies = []
+    stats = {"connected": 0, "failed": 0, "dropped": 0, "errors": 0}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(
+        *(
+            run_connection(args.host, args.port, frame, deadline, latencies, stats)
+            for _ in range(args.connections)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    return latencies, stats, elapsed
+
+
+def wait_for_port(host, port, timeout):
+    """Ожидание, пока сервер начнет принимать подключения"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_local_server(args):
+    """Запуск сервера в режиме asyncio в отдельном процессе"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (PROJECT_ROOT, env.get("PYTHONPATH")) if path
+    )
+    command = [
+        sys.executable,
+        os.path.join(PROJECT_ROOT, "scripts", "run_server.py"),
+        "--mode",
+        "async",
+        "--quiet",
+        "--host",
+        args.host,
+        "--port",
+        str(args.port),
+        "--input",
+        args.input,
+        "--step-interval",
+        str(args.step_interval),
+    ]
+    server = subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    if not wait_for_port(args.host, args.port, timeout=30):
+        server.terminate()
+        raise RuntimeError("Сервер не запустился за 30 секунд")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест сервера: подключения, запросы в секунду, p99"
+    )
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Адрес (по умолчанию: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=5001, help="Порт (по умолчанию: 5001)"
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=1000,
+        help="Одновременных подключений (по умолчанию: 1000)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10,
+        help="Длительность теста, секунды (по умолчанию: 10)",
+    )
+    parser.add_argument(
+        "--message",
+        choices=[
+            "get_simulation_time",
+            "get_store_status",
+            "get_vehicle_status",
+            "get_all_stores",
+            "get_all_vehicles",
+            "get_network_state",
+        ],
+        default="get_simulation_time",
+        help="Тип запроса (по умолчанию: get_simulation_time)",
+    )
+    parser.add_argument(
+        "--store-id", type=int, default=1, help="Номер магазина (по умолчанию: 1)"
+    )
+    parser.add_argument(
+        "--vehicle-id", type=int, default=1, help="Номер машины (по умолчанию: 1)"
+    )
+    parser.add_argument(
+        "--spawn",
+        action="store_true",
+        help="Запустить локальный сервер (asyncio) на время теста",
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default="data/input_data.json",
+        help="Исходные данные для --spawn (по умолчанию: data/input_data.json)",
+    )
+    parser.add_argument(
+        "--step-interval",
+        type=float,
+        default=0,
+        help="Секунд между шагами модели для --spawn, 0 - так быстро, "
+        "как возможно (по умолчанию: 0)",
+    )
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    server = start_local_server(args) if args.spawn else None
+    try:
+        latencies, stats, elapsed = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print("\nНАГРУЗОЧНЫЙ ТЕСТ")
+    print("=" * 50)
+    print(f"Запрос: {args.message}")
+    print(
+        f"Подключений: {stats['connected']} из {args.connections} "
+        f"(ошибок подключения: {stats['failed']}, разорвано: {stats['dropped']})"
+    )
+    print(f"Запросов: {len(latencies)} (с ошибкой в ответе: {stats['errors']})")
+    print(f"Запросов в секунду: {len(latencies) / elapsed:.0f}")
+    if latencies:
+        milliseconds = np.array(latencies) * 1000
+        p50, p99 = np.percentile(milliseconds, [50, 99])
+        print(
+            f"Задержка, мс: p50 {p50:.2f}, p99 {p99:.2f}, "
+            f"макс. {milliseconds.max():.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,8 @@ import argparse
 import time
 
 
-def format_store_status(response):
+def format_store_status(data):
     """Форматирование статуса магазина"""
-    if response["status"] != "success":
-        return f"Ошибка: {response.get('message', 'Неизвестная ошибка')}"
-
-    data = response["data"]
     store_name = data["name"]
     inventory = data["inventory"]
     requirements = data["requirements"]
@@ -21,22 +17,15 @@ def format_store_status(response):
         required = requirements[product]
         products_info.append(f"{product}: {current}/{required}")
 
-    # Форматируем временные окна
-    windows = [f"{start}:00-{end}:00" for start, end in data["delivery_windows"]]
-
     return (
         f"\nМагазин: {store_name}\n"
         f"Запасы/Требуемые: {', '.join(products_info)}\n"
-        f"Окна доставки: {', '.join(windows)}"
+        f"Окна доставки: {data['windows_text']}"
     )
 
 
-def format_vehicle_status(response):
+def format_vehicle_status(data):
     """Форматирование статуса машины"""
-    if response["status"] != "success":
-        return f"Ошибка: {response.get('message', 'Неизвестная ошибка')}"
-
-    data = response["data"]
     vehicle_id = data["vehicle_id"]
     status = data["status"]
     load = data["current_load"]
@@ -80,7 +69,21 @@ def main():
         "--port", type=int, default=5001, help="Порт сервера (по умолчанию: 5001)"
     )
     parser.add_argument(
-        "--delay", type=int, default=15, help="Задержка между шагами в секундах (по умолчанию: 15)"
+        "--stores",
+        type=int,
+        nargs="+",
+        default=[1, 2],
+        help="Номера магазинов (по умолчанию: 1 2)",
+    )
+    parser.add_argument(
+        "--vehicles",
+        type=int,
+        nargs="+",
+        default=[1, 2],
+        help="Номера машин (по умолчанию: 1 2)",
+    )
+    parser.add_argument(
+        "--delay", type=int, default=15, help="Задержка между обновлениями в секундах (по умолчанию: 15)"
     )
 
     args = parser.parse_args()
@@ -93,34 +96,40 @@ def main():
         print("Успешное подключение к серверу!")
 
         while True:
-            # Получаем текущее время симуляции
-            response = client.send_message({"type": "get_simulation_time"})
-            if response["status"] == "success":
-                current_time = response["data"]["time"]
-                print("\n" + "=" * 50)
-                print(f"🕒 ВРЕМЯ СИМУЛЯЦИИ: {current_time}")
-                print("=" * 50)
+            # Время, магазины и машины - одним запросом и с одного шага
+            response = client.get_network_state(
+                store_ids=args.stores, vehicle_ids=args.vehicles
+            )
+            if response["status"] != "success":
+                print(f"Ошибка: {response.get('message', 'Неизвестная ошибка')}")
+                time.sleep(args.delay)
+                continue
+            data = response["data"]
+
+            print("\n" + "=" * 50)
+            print(f"🕒 ВРЕМЯ СИМУЛЯЦИИ: {data['time']}")
+            print("=" * 50)
             
             print("\nСТАТУС СИСТЕМЫ")
             print("=" * 50)
 
-            # Запрашиваем статус магазинов
+            # Статус магазинов
             print("\nМАГАЗИНЫ:")
-            for store_id in [1, 2]:
-                request = {"type": "get_store_status", "store_id": store_id}
-                response = client.send_message(request)
-                print(format_store_status(response))
+            for store in data["stores"]:
+                print(format_store_status(store))
+            for store_id in data["missing"]["stores"]:
+                print(f"Ошибка: Store {store_id} not found")
 
-            # Запрашиваем статус машин
+            # Статус машин
             print("\nТРАНСПОРТ:")
-            for vehicle_id in [1, 2]:
-                request = {"type": "get_vehicle_status", "vehicle_id": vehicle_id}
-                response = client.send_message(request)
-                print(format_vehicle_status(response))
+            for vehicle in data["vehicles"]:
+                print(format_vehicle_status(vehicle))
+            for vehicle_id in data["missing"]["vehicles"]:
+                print(f"Ошибка: Vehicle {vehicle_id} not found")
 
             print("\n" + "=" * 50)
             
-            # Задержка перед следующим шагом
+            # Задержка перед следующим обновлением
             print(f"\nСледующее обновление через {args.delay} секунд...")
             time.sleep(args.delay)  # Пауза между обновлениями
 
@@ -0,0 +1,99 @@
+# scripts/run_montecarlo.py
+from delivery_system.montecarlo import KPI_NAMES, run_monte_carlo
+import argparse
+import csv
+
+KPI_TITLES = {
+    "deliveries_completed": "Выполнено доставок",
+    "stockout_minutes": "Минут дефицита (магазин x товар)",
+    "km_driven": "Пробег, км",
+    "vehicle_utilization": "Загрузка машин",
+}
+
+
+def positive_int(text: str) -> int:
+    """Целое число не меньше 1 (для --runs)"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("Ожидается целое число не меньше 1")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Параллельные прогоны модели доставки (метод Монте-Карло)"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default="data/input_data.json",
+        help="Файл с исходными данными (по умолчанию: data/input_data.json)",
+    )
+    parser.add_argument(
+        "--runs",
+        type=positive_int,
+        default=100,
+        help="Количество прогонов (по умолчанию: 100)",
+    )
+    parser.add_argument(
+        "--steps",
+        type=int,
+        default=96,
+        help="Шагов в одном прогоне (по умолчанию: 96, сутки по 15 минут)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Общее зерно генератора (по умолчанию: 0)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Количество процессов (по умолчанию: все ядра)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["tick", "event"],
+        default="tick",
+        help="Режим симуляции (по умолчанию: tick)",
+    )
+    parser.add_argument(
+        "--vectorized", action="store_true", help="Векторный режим запасов"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="CSV-файл с показателями прогонов"
+    )
+    args = parser.parse_args()
+
+    result = run_monte_carlo(
+        args.input,
+        args.runs,
+        args.steps,
+        seed=args.seed,
+        workers=args.workers,
+        mode=args.mode,
+        vectorized=args.vectorized,
+    )
+
+    print(f"Прогонов: {args.runs}, шагов в прогоне: {args.steps}")
+    print(f"Процессов: {result['workers']}")
+    print(f"Время: {result['elapsed']:.2f} с")
+    print(f"Производительность: {result['runs_per_second']:.1f} прогонов/с")
+    print("\nПОКАЗАТЕЛИ (среднее ± ст. откл. [мин - макс])")
+    print("=" * 50)
+    for name in KPI_NAMES:
+        stats = result["summary"][name]
+        print(
+            f"{KPI_TITLES[name]}: {stats['mean']:.2f} ± {stats['std']:.2f} "
+            f"[{stats['min']:.2f} - {stats['max']:.2f}]"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["seed"] + KPI_NAMES)
+            writer.writeheader()
+            writer.writerows(result["runs"])
+        print(f"\nПоказатели прогонов сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,73 @@
 # scripts/run_server.py
 from delivery_system.networking.server import DeliveryServer
+from delivery_system.networking.clock import DEFAULT_STEP_INTERVAL
+from delivery_system.networking.async_server import (
+    AsyncDeliveryServer,
+    raise_open_file_limit,
+)
 from delivery_system.model import DeliveryModel
-import os
-
-
-from delivery_system.networking.server import DeliveryServer
-from delivery_system.model import DeliveryModel
+import argparse
 import os
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Сервер системы доставки")
+    parser.add_argument(
+        "--input",
+        type=str,
+        default="data/input_data.json",
+        help="Файл с исходными данными (по умолчанию: data/input_data.json)",
+    )
+    parser.add_argument(
+        "--host", type=str, default="0.0.0.0", help="Адрес (по умолчанию: 0.0.0.0)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=5001, help="Порт (по умолчанию: 5001)"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["thread", "async"],
+        default="thread",
+        help="thread - поток на клиента, async - один цикл событий asyncio "
+        "для тысяч подключений (по умолчанию: thread)",
+    )
+    parser.add_argument(
+        "--step-interval",
+        type=float,
+        default=DEFAULT_STEP_INTERVAL,
+        help="Секунд между шагами модели, 0 - так быстро, как возможно "
+        f"(по умолчанию: {DEFAULT_STEP_INTERVAL})",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Не выводить ход симуляции в консоль",
+    )
+    args = parser.parse_args()
+
     # Файл находится в папке data в корне проекта
-    input_file = "data/input_data.json"
+    input_file = args.input
 
     # Проверяем существование файла
     if not os.path.exists(input_file):
         print(f"Ошибка: Файл {input_file} не найден!")
         return
 
-    model = DeliveryModel(input_file)
-    server = DeliveryServer(host="0.0.0.0", port=5001)
+    model = DeliveryModel(input_file, quiet=args.quiet)
+    if args.mode == "async":
+        limit = raise_open_file_limit()
+        if limit is not None:
+            print(f"Лимит открытых файлов: {limit}")
+        server = AsyncDeliveryServer(
+            host=args.host, port=args.port, step_interval=args.step_interval
+        )
+    else:
+        server = DeliveryServer(
+            host=args.host, port=args.port, step_interval=args.step_interval
+        )
     server.model = model
 
-    print(f"Запуск сервера на localhost:5001...")
+    print(f"Запуск сервера на {args.host}:{args.port}...")
     server.start()
 
 
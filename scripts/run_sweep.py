@@ -0,0 +1,159 @@
+# scripts/run_sweep.py
+from delivery_system.montecarlo import KPI_NAMES
+from delivery_system.sweep import (
+    DEFAULT_CACHE_DIR,
+    SWEEP_PARAMS,
+    grid,
+    random_points,
+    run_sweep,
+)
+import argparse
+import csv
+
+
+def parse_param(text: str):
+    """Разбор параметра: name=1,2,3 (список) или name=min:max (диапазон)"""
+    name, _, values = text.partition("=")
+    if name not in SWEEP_PARAMS or not values:
+        raise argparse.ArgumentTypeError(
+            f"Ожидается name=v1,v2 или name=min:max, name из {list(SWEEP_PARAMS)}"
+        )
+    cast = SWEEP_PARAMS[name]
+    if ":" in values:
+        low, high = values.split(":", 1)
+        return name, (cast(low), cast(high))
+    return name, [cast(value) for value in values.split(",")]
+
+
+def positive_int(text: str) -> int:
+    """Целое число не меньше 1 (для --runs)"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("Ожидается целое число не меньше 1")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Перебор параметров модели доставки (размер парка, "
+        "вместимость машин, пороги заказа)"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default="data/input_data.json",
+        help="Файл с исходными данными (по умолчанию: data/input_data.json)",
+    )
+    parser.add_argument(
+        "--param",
+        type=parse_param,
+        action="append",
+        required=True,
+        help="Параметр: fleet_size=2,3,4 или reorder_level=0.6:0.9 "
+        "(можно указать несколько раз)",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=None,
+        help="Случайная выборка из N точек вместо полного перебора",
+    )
+    parser.add_argument(
+        "--runs",
+        type=positive_int,
+        default=10,
+        help="Прогонов в каждой точке (по умолчанию: 10)",
+    )
+    parser.add_argument(
+        "--steps",
+        type=int,
+        default=96,
+        help="Шагов в одном прогоне (по умолчанию: 96, сутки по 15 минут)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Общее зерно генератора (по умолчанию: 0)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Количество процессов (по умолчанию: все ядра)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["tick", "event"],
+        default="tick",
+        help="Режим симуляции (по умолчанию: tick)",
+    )
+    parser.add_argument(
+        "--vectorized", action="store_true", help="Векторный режим запасов"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Каталог кеша прогонов (по умолчанию: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Не использовать кеш прогонов"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="CSV-файл со сводкой по точкам"
+    )
+    args = parser.parse_args()
+
+    space = dict(args.param)
+    if args.sample:
+        points = random_points(space, args.sample, seed=args.seed)
+    else:
+        ranges = [name for name, values in space.items() if isinstance(values, tuple)]
+        if ranges:
+            parser.error(f"Диапазоны допустимы только с --sample: {ranges}")
+        points = grid(space)
+
+    result = run_sweep(
+        args.input,
+        points,
+        args.runs,
+        args.steps,
+        seed=args.seed,
+        workers=args.workers,
+        mode=args.mode,
+        vectorized=args.vectorized,
+        cache_dir=None if args.no_cache else args.cache_dir,
+    )
+
+    print(f"Точек: {len(points)}, прогонов в точке: {args.runs}")
+    print(
+        f"Посчитано прогонов: {result['computed_runs']}, "
+        f"взято из кеша: {result['cached_runs']}"
+    )
+    print(f"Процессов: {result['workers']}, время: {result['elapsed']:.2f} с")
+    print("\nСРЕДНИЕ ПОКАЗАТЕЛИ ПО ТОЧКАМ")
+    print("=" * 50)
+    for point in result["points"]:
+        params = ", ".join(f"{name}={value}" for name, value in point["params"].items())
+        means = ", ".join(
+            f"{name}={point['summary'][name]['mean']:.2f}" for name in KPI_NAMES
+        )
+        print(f"{params}: {means}")
+
+    if args.output:
+        names = list(space)
+        fieldnames = names + [
+            f"{kpi}_{stat}" for kpi in KPI_NAMES for stat in ("mean", "std")
+        ]
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for point in result["points"]:
+                row = dict(point["params"])
+                for kpi in KPI_NAMES:
+                    row[f"{kpi}_mean"] = point["summary"][kpi]["mean"]
+                    row[f"{kpi}_std"] = point["summary"][kpi]["std"]
+                writer.writerow(row)
+        print(f"\nСводка сохранена в {args.output}")
+
+
+if __name__ == "__main__":
+    main()